@@ -0,0 +1,74 @@
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+INTERACTIVE, BULK = 0, 1
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full; the API answers 429 with Retry-After."""
+
+
+class AdmissionController:
+    """Bounded priority queue in front of a fixed number of in-flight generations.
+
+    Slots are taken per LLM generation, not per HTTP request: cache and FAQ hits
+    never queue, and every question of a batch that needs generating takes its
+    own slot. Interactive generations are always admitted before bulk (Slack/batch)
+    ones; generations of the same priority are served first come, first served.
+    """
+
+    def __init__(self, max_inflight, max_queue):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.counters = {"admitted": 0, "rejected": 0}
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def acquire(self, priority=INTERACTIVE):
+        with self._lock:
+            if self.inflight < self.max_inflight and not self._waiters:
+                self.inflight += 1
+                self.counters["admitted"] += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise Overloaded("Chatbot is busy, please retry later")
+            granted = threading.Event()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), granted))
+        granted.wait()
+        with self._lock:
+            self.counters["admitted"] += 1
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot moves straight to the next waiter, in-flight count is unchanged
+                heapq.heappop(self._waiters)[2].set()
+            else:
+                self.inflight -= 1
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "inflight": self.inflight,
+                "queued": len(self._waiters),
+                "max_inflight": self.max_inflight,
+                "max_queue": self.max_queue,
+            }
@@ -1,60 +1,63 @@
 import os
-import json
+import uuid
 import streamlit as st
 from dataclasses import dataclass
 from typing import Literal
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_community.llms import Ollama
-from langchain.chains import create_retrieval_chain
-
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.output_parsers import StrOutputParser
 import streamlit.components.v1 as components
+from index_store import load_or_build_index
+from context_builder import ConversationContext, create_summarizer
+from history_store import HistoryStore, HISTORY_PAGE_SIZE
+from query_router import QueryRouter
 
 # Constants
 PDF_FILE = "../input.pdf"
-HISTORY_FILE = "chat_history.json"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 LLM_MODEL = "llama3.2:3b"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1024))
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", 6))
 
 @dataclass
 class Message:
     origin: Literal["human", "ai"]
     message: str
 
+history_store = HistoryStore()
+
+def get_session_id():
+    # Kept in the URL so a browser reload resumes the same conversation
+    if "session" not in st.query_params:
+        st.query_params["session"] = uuid.uuid4().hex
+    return st.query_params["session"]
+
 # Function to load or initialize chat history
 def load_chat_history():
-    return json.load(open(HISTORY_FILE, "r")) if os.path.exists(HISTORY_FILE) else []
+    return history_store.recent(get_session_id(), limit=HISTORY_PAGE_SIZE)
 
-def save_chat_history(history):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f)
+def save_chat_messages(messages):
+    history_store.append_many(get_session_id(), messages)
 
 def clear_chat_history():
-    if os.path.exists(HISTORY_FILE):
-        os.remove(HISTORY_FILE)
+    history_store.clear(get_session_id())
 
-def is_engagement_query(query):
-    keywords = ["engagement", "post", "trend", "interaction"]
-    return any(kw in query.lower() for kw in keywords)
-
-# Load and process document
-def setup_vector_database():
-    loader = PyPDFLoader(PDF_FILE)
-    documents = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100).split_documents(loader.load())
-    return Chroma.from_documents(documents, SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL))
+# Load the persisted index, re-embedding only changed documents
+def setup_vector_database(embeddings):
+    return load_or_build_index([PDF_FILE], embeddings=embeddings, embedding_model=EMBEDDING_MODEL)
 
 def initialize_session():
     if "history" not in st.session_state:
         st.session_state.history = load_chat_history()
 
-    if "retrieval_chain" not in st.session_state:
+    if "engagement_chain" not in st.session_state:
         llm = Ollama(model=LLM_MODEL)
-        db = setup_vector_database()
+        embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+        st.session_state.embeddings = embeddings
+        st.session_state.db = setup_vector_database(embeddings)
+        st.session_state.router = QueryRouter(embeddings)
 
         retrieval_prompt = ChatPromptTemplate.from_messages([
             ("system", """
@@ -66,8 +69,7 @@ def initialize_session():
             ("human", "{input}")
         ])
 
-        engagement_chain = create_stuff_documents_chain(llm, retrieval_prompt)
-        st.session_state.retrieval_chain = create_retrieval_chain(db.as_retriever(), engagement_chain)
+        st.session_state.engagement_chain = create_stuff_documents_chain(llm, retrieval_prompt)
 
         general_prompt = ChatPromptTemplate.from_messages([
             ("system", "Provide engaging, curiosity-driven responses to user questions."),
@@ -75,23 +77,34 @@ def initialize_session():
         ])
         st.session_state.general_chain = general_prompt | llm | StrOutputParser()
 
+        # Keeps per-turn prompt size flat: recent turns verbatim, older ones in a cached rolling summary
+        st.session_state.context_builder = ConversationContext(
+            create_summarizer(llm),
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            recent_turns=CONTEXT_RECENT_TURNS,
+        )
+
 def process_user_input():
     user_query = st.session_state.user_input.strip()
     if not user_query:
         return
 
-    context = "\n".join(f"{msg['origin']}: {msg['message']}" for msg in st.session_state.history)
+    context = st.session_state.context_builder.build(st.session_state.history)
 
-    if is_engagement_query(user_query):
-        response = st.session_state.retrieval_chain.invoke({"input": context + "\n" + user_query})['answer']
+    # Embed the query once: the same vector picks the route and drives the vector search
+    embedding = st.session_state.embeddings.embed_query(user_query)
+    if st.session_state.router.needs_retrieval(embedding):
+        docs = st.session_state.db.similarity_search_by_vector(embedding)
+        response = st.session_state.engagement_chain.invoke({"input": context + "\n" + user_query, "context": docs})
     else:
         response = st.session_state.general_chain.invoke({"input": context + "\n" + user_query})
 
-    st.session_state.history.extend([
+    new_messages = [
         {"origin": "human", "message": user_query},
         {"origin": "ai", "message": response}
-    ])
-    save_chat_history(st.session_state.history)
+    ]
+    st.session_state.history.extend(new_messages)
+    save_chat_messages(new_messages)
 
 def apply_custom_styles():
     st.markdown("""
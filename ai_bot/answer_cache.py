@@ -0,0 +1,137 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key."""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+class SemanticCache:
+    """LRU + TTL answer cache keyed on the normalized question and its embedding.
+
+    Exact normalized matches are served from a dict lookup; otherwise the closest
+    cached question (cosine similarity) above ``similarity_threshold`` is reused.
+    The whole cache is dropped when the vector index version changes.
+    """
+
+    def __init__(self, similarity_threshold=0.92, ttl_seconds=3600, max_entries=1000, max_bytes=16 * 1024 * 1024):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_version = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(question, route):
+        return (route, normalize_question(question))
+
+    @staticmethod
+    def _entry_size(key, answer, vector):
+        return sys.getsizeof(key[1]) + sys.getsizeof(answer) + vector.nbytes
+
+    def _check_version(self, index_version):
+        if index_version is not None and index_version != self.index_version:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._clear()
+            self.index_version = index_version
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        self._matrix = None
+
+    def _expired(self, entry, now):
+        return self.ttl_seconds and now - entry["created_at"] > self.ttl_seconds
+
+    def _nearest(self, route, vector):
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.vstack([self._entries[k]["vector"] for k in self._matrix_keys]) if self._matrix_keys else None
+        if self._matrix is None:
+            return None, 0.0
+        scores = self._matrix @ vector
+        for i in np.argsort(-scores):
+            if self._matrix_keys[i][0] == route:
+                return self._matrix_keys[i], float(scores[i])
+        return None, 0.0
+
+    def get(self, question, embedding, route=None, index_version=None):
+        key = self._key(question, route)
+        vector = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_version(index_version)
+            similarity = 1.0
+            if key not in self._entries:
+                key, similarity = self._nearest(route, vector)
+                if key is None or similarity < self.similarity_threshold:
+                    self.counters["misses"] += 1
+                    return None
+            entry = self._entries[key]
+            if self._expired(entry, now):
+                self._remove(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits" if similarity == 1.0 else "near_hits"] += 1
+            return entry["answer"]
+
+    def put(self, question, embedding, answer, route=None, index_version=None):
+        key = self._key(question, route)
+        vector = _unit(embedding)
+        size = self._entry_size(key, answer, vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(index_version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"answer": answer, "vector": vector, "created_at": time.time(), "size": size}
+            self._bytes += size
+            self._matrix = None
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["near_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": (self.counters["hits"] + self.counters["near_hits"]) / lookups if lookups else 0.0,
+                "index_version": self.index_version,
+            }
+
+
+def _unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -1,16 +1,15 @@
 import os
 import json
-from flask import Flask, request, jsonify
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.llms import Ollama
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.output_parsers import StrOutputParser
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
+from index_store import load_or_build_index, current_index_version
+from answer_cache import SemanticCache, normalize_question
+from single_flight import SingleFlight
+from metrics import Metrics
+from admission import AdmissionController, Overloaded, INTERACTIVE, BULK
 
 # Load environment variables
 load_dotenv()
@@ -21,59 +20,452 @@ app = Flask(__name__)
 PDF_FILE = os.getenv("PDF_FILE", "../input.pdf")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2:3b")
+# Bump whenever the prompts or context assembly change so precomputed answers are regenerated
+PROMPT_VERSION = "2"
 PORT = int(os.getenv("CHATBOT_PORT", 7000))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 3))
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# "chroma" searches Chroma's HNSW index; "quantized" scans memory-mapped int8/binary codes and reads chunks from
+# that export, so queries never make Chroma load its HNSW index into the serving process
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "chroma")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 2))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 100))
+# Admission control: generations running at once, generations waiting, and the 429 back-off hint
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", 2))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", 32))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 5))
+ROUTER_RETRIEVAL_MARGIN = float(os.getenv("ROUTER_RETRIEVAL_MARGIN", 0.02))
+# "stub" swaps in deterministic fixed-latency backends (stub_backends.py) for load testing
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+# FAQ fast path over the scraped miniso_qa_data pairs; disabled when MONGODB_URI is unset
+MONGODB_URI = os.getenv("MONGODB_URI")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "company_data")
+FAQ_COLLECTION = os.getenv("FAQ_COLLECTION", "miniso_qa_data")
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", 0.9))
+FAQ_REFRESH_SECONDS = int(os.getenv("FAQ_REFRESH_SECONDS", 300))
+# Retrieved chunks are cut down to the most query-relevant sentences within this many tokens; 0 disables
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 200))
+CONTEXT_MIN_SIMILARITY = float(os.getenv("CONTEXT_MIN_SIMILARITY", 0.2))
+# Run one tiny generation during warm-up so Ollama has the model weights loaded before traffic arrives
+WARMUP_GENERATION = os.getenv("WARMUP_GENERATION", "true").lower() == "true"
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", 5))
+# Routes that answer while the models are still loading
+PROBE_PATHS = ("/", "/healthz", "/readyz", "/metrics", "/metrics/summary", "/serving/stats")
 
-# Setup vector database
-def setup_vector_database():
-    loader = PyPDFLoader(PDF_FILE)
-    documents = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100).split_documents(loader.load())
-    return Chroma.from_documents(documents, SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL))
-
-# Initialize chains
-db = setup_vector_database()
-llm = Ollama(model=LLM_MODEL)
-
-retrieval_prompt = ChatPromptTemplate.from_messages([
-    ("system", """
-    Use retrieved data to generate an engaging response:
-    {context}.
-    Encourage user curiosity and interactions while aligning with brand tone.
-    Respond concisely in 4-5 lines.
-    """),
-    ("human", "{input}")
-])
-engagement_chain = create_stuff_documents_chain(llm, retrieval_prompt)
-retrieval_chain = create_retrieval_chain(db.as_retriever(), engagement_chain)
-
-general_prompt = ChatPromptTemplate.from_messages([
-    ("system", "Provide engaging, curiosity-driven responses to user questions."),
-    ("user", "Question: {input}")
-])
-general_chain = general_prompt | llm | StrOutputParser()
-
-def get_chatbot_response(question):
+# Setup vector database (loads the persisted index, re-embeds only changed sources)
+def setup_vector_database(embeddings, embedding_model=EMBEDDING_MODEL):
+    return load_or_build_index([PDF_FILE], embeddings=embeddings, embedding_model=embedding_model)
+
+def create_embeddings():
+    """Return the embedding backend and the model name recorded in the index manifest."""
+    if EMBEDDING_BACKEND == "stub":
+        from stub_backends import StubEmbeddings
+        stub = StubEmbeddings()
+        return stub, f"stub-{stub.dim}"
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL), EMBEDDING_MODEL
+
+def create_faq_index(embeddings):
+    if not MONGODB_URI:
+        return None
+    import pymongo
+    from faq_index import FaqIndex
+    # Short server selection timeout so an unreachable MongoDB cannot stall warm-up
+    client = pymongo.MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    return FaqIndex(embeddings, client[DATABASE_NAME][FAQ_COLLECTION], threshold=FAQ_MATCH_THRESHOLD, refresh_seconds=FAQ_REFRESH_SECONDS)
+
+def create_llm():
+    if LLM_BACKEND == "stub":
+        from stub_backends import StubLLM
+        return StubLLM()
+    from langchain_community.llms import Ollama
+    return Ollama(model=LLM_MODEL)
+
+in_flight = SingleFlight()
+metrics = Metrics()
+metrics.register_gauge("single_flight_in_flight", lambda: in_flight.stats()["in_flight"])
+answer_cache = SemanticCache(
+    similarity_threshold=ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+)
+metrics.register_gauge("answer_cache_entries", lambda: answer_cache.stats()["entries"])
+admission = AdmissionController(MAX_INFLIGHT, MAX_QUEUE)
+metrics.register_gauge("queue_depth", lambda: admission.queued)
+metrics.register_gauge("admission_inflight", lambda: admission.inflight)
+
+# Populated by warm_up() in a background thread, so the server binds before any model is loaded
+embeddings = db = llm = router = retriever = faq_index = compressor = None
+retrieval_prompt = general_prompt = None
+estimate_tokens = None
+ready = threading.Event()
+startup = {"state": "starting", "error": None, "started_at": None, "ready_at": None, "timings": {}}
+_warm_up_lock = threading.Lock()
+
+def _timed(step, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    startup["timings"][step] = round(time.perf_counter() - start, 3)
+    return result
+
+def load_components():
+    global embeddings, db, llm, router, retriever, faq_index, compressor, retrieval_prompt, general_prompt, estimate_tokens
+    # LangChain, sentence-transformers and Chroma take seconds to import, so they load here
+    from langchain_core.prompts import ChatPromptTemplate
+    from query_router import QueryRouter
+    from hybrid_retriever import HybridRetriever
+    from quantized_index import QuantizedIndex
+    from context_builder import estimate_tokens
+    from context_compressor import ContextCompressor
+    from index_store import CHUNK_OVERLAP, open_collection
+
+    retrieval_prompt = ChatPromptTemplate.from_messages([
+        ("system", """
+        Use retrieved data to generate an engaging response:
+        {context}.
+        Encourage user curiosity and interactions while aligning with brand tone.
+        Respond concisely in 4-5 lines.
+        """),
+        ("human", "{input}")
+    ])
+
+    general_prompt = ChatPromptTemplate.from_messages([
+        ("system", "Provide engaging, curiosity-driven responses to user questions."),
+        ("user", "Question: {input}")
+    ])
+
+    embeddings, embedding_model = _timed("embeddings", create_embeddings)
+    _timed("embed_probe", embeddings.embed_query, "warm up")
+    db = _timed("index", setup_vector_database, embeddings, embedding_model)
+    llm = create_llm()
+    router = _timed("router", QueryRouter, embeddings, retrieval_margin=ROUTER_RETRIEVAL_MARGIN)
+    dense_index = QuantizedIndex() if VECTOR_INDEX_MODE == "quantized" else None
+    retriever = _timed(
+        "retriever",
+        HybridRetriever,
+        db,
+        open_collection(),
+        candidates=RETRIEVAL_CANDIDATES,
+        top_n=RETRIEVAL_K,
+        rrf_k=RRF_K,
+        reranker_model=RERANKER_MODEL,
+        index_version=current_index_version(),
+        dense_index=dense_index,
+    )
+    faq_index = _timed("faq", create_faq_index, embeddings)
+    if CONTEXT_TOKEN_BUDGET:
+        compressor = ContextCompressor(embeddings, CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_SIMILARITY, max_overlap=2 * CHUNK_OVERLAP)
+    if WARMUP_GENERATION:
+        _timed("generation", llm.invoke, "Reply with OK.", num_predict=1)
+
+def warm_up():
+    try:
+        load_components()
+    except Exception as e:
+        startup.update(state="failed", error=str(e))
+        app.logger.exception("Chatbot warm-up failed")
+        return
+    startup.update(state="ready", ready_at=time.time())
+    ready.set()
+
+def start_warm_up():
+    """Load models and indexes in the background; safe to call more than once."""
+    with _warm_up_lock:
+        if startup["started_at"] is None:
+            startup["started_at"] = time.time()
+            threading.Thread(target=warm_up, name="chatbot-warm-up", daemon=True).start()
+
+@app.before_request
+def reject_until_ready():
+    if ready.is_set() or request.path in PROBE_PATHS:
+        return None
+    response = jsonify({"error": "Chatbot is starting up, please retry shortly", "state": startup["state"]})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(WARMUP_RETRY_AFTER)
+    return response
+
+def record_cache_result(cached):
+    metrics.increment("cache_hits" if cached is not None else "cache_misses")
+    return cached
+
+def find_stored_answer(question, embedding, index_version):
+    # Near-duplicate questions reuse a stored answer instead of a new generation
+    cached = record_cache_result(answer_cache.get(question, embedding, index_version=index_version))
+    if cached is None and faq_index is not None:
+        # Scraped FAQ pairs answer store and product questions without touching the LLM
+        match = faq_index.lookup(question, embedding)
+        if match is not None:
+            metrics.increment("faq_hits")
+            cached = match["answer"]
+    return cached
+
+def lookup_cached_answer(question):
+    with metrics.timer("embed"):
+        embedding = embeddings.embed_query(normalize_question(question))
+    index_version = current_index_version()
+    return embedding, index_version, find_stored_answer(question, embedding, index_version)
+
+def retrieve_documents(question, embedding):
+    # Dense search reuses the question embedding computed for the cache lookup; BM25 covers exact terms/SKUs
+    with metrics.timer("retrieve"):
+        return retriever.retrieve(question, embedding, index_version=current_index_version())
+
+def build_context(question, embedding, documents):
+    full = "\n\n".join(doc.page_content for doc in documents)
+    if compressor is None:
+        return full
+    with metrics.timer("compress"):
+        context = compressor.compress(question, embedding, documents)
+    metrics.increment("context_tokens_retrieved", estimate_tokens(full))
+    metrics.increment("context_tokens_kept", estimate_tokens(context))
+    return context
+
+def build_prompt(question, embedding):
     # For simplicity, here we use an empty context.
     context = ""
-    # If question appears to be about engagement, use retrieval; else use general chain.
-    if "engagement" in question.lower():
-        response = retrieval_chain.invoke({"input": context + "\n" + question})['answer']
-    else:
-        response = general_chain.invoke({"input": context + "\n" + question})
+    # Route on the same embedding: retrieval only when the question is about the brand/engagement data.
+    documents = retrieve_documents(question, embedding) if router.needs_retrieval(embedding) else None
+    retrieved = build_context(question, embedding, documents) if documents is not None else None
+    with metrics.timer("prompt"):
+        if retrieved is None:
+            prompt = general_prompt.invoke({"input": context + "\n" + question})
+        else:
+            prompt = retrieval_prompt.invoke({"input": context + "\n" + question, "context": retrieved})
+    metrics.increment("prompt_tokens", estimate_tokens(prompt.to_string()))
+    return prompt
+
+def request_priority():
+    return BULK if request.headers.get("X-Priority", "").lower() == "bulk" else INTERACTIVE
+
+def run_generation(question, embedding, index_version, priority=INTERACTIVE):
+    with admission.slot(priority):
+        prompt = build_prompt(question, embedding)
+        with metrics.timer("generate"):
+            response = llm.invoke(prompt)
+    metrics.increment("completion_tokens", estimate_tokens(response))
+    answer_cache.put(question, embedding, response, index_version=index_version)
     return response
 
+def generate_answer(question, embedding, index_version, priority=INTERACTIVE):
+    # Concurrent requests for the same question and route share one in-flight generation (and admission slot)
+    key = (router.route(embedding), normalize_question(question), index_version)
+    return in_flight.do(key, run_generation, question, embedding, index_version, priority)
+
+def get_chatbot_response(question, priority=INTERACTIVE):
+    with metrics.timer("total"):
+        embedding, index_version, cached = lookup_cached_answer(question)
+        if cached is not None:
+            return cached
+        return generate_answer(question, embedding, index_version, priority)
+
+def get_chatbot_responses(questions):
+    """Answer many questions with one batched embedding call and bounded LLM concurrency."""
+    results = [None] * len(questions)
+    valid = [i for i, question in enumerate(questions) if isinstance(question, str) and question.strip()]
+    for i in set(range(len(questions))) - set(valid):
+        results[i] = {"question": questions[i], "error": "No question provided"}
+    if not valid:
+        return results
+
+    with metrics.timer("embed_batch"):
+        vectors = embeddings.embed_documents([normalize_question(questions[i]) for i in valid])
+    index_version = current_index_version()
+    pending = []
+    for i, embedding in zip(valid, vectors):
+        cached = find_stored_answer(questions[i], embedding, index_version)
+        if cached is not None:
+            results[i] = {"question": questions[i], "answer": cached}
+        else:
+            pending.append((i, embedding))
+
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        futures = [(i, pool.submit(generate_answer, questions[i], embedding, index_version, BULK)) for i, embedding in pending]
+        for i, future in futures:
+            try:
+                results[i] = {"question": questions[i], "answer": future.result()}
+            except Exception as e:
+                results[i] = {"question": questions[i], "error": str(e)}
+    return results
+
+def stream_chatbot_response(question, priority=INTERACTIVE):
+    """Return ``(tokens, close)`` for a streamed answer.
+
+    The admission slot is taken before the first token, so a full queue is a 429
+    rather than a mid-stream error, and is held until ``close`` is called. Like the
+    non-streaming path, ``total`` and ``first_token`` are timed from here, so they
+    include embedding, retrieval and any wait for a slot.
+    """
+    started = time.perf_counter()
+
+    def observe_total():
+        metrics.observe("total", time.perf_counter() - started)
+
+    embedding, index_version, cached = lookup_cached_answer(question)
+    if cached is not None:
+        return iter([cached]), observe_total
+    admission.acquire(priority)
+
+    def close():
+        admission.release()
+        observe_total()
+    return stream_generation(question, embedding, index_version, started), close
+
+def stream_generation(question, embedding, index_version, started):
+    """Yield answer tokens as the Ollama chain produces them."""
+    prompt = build_prompt(question, embedding)
+    pieces = []
+    start = time.perf_counter()
+    for token in llm.stream(prompt):
+        if not pieces:
+            metrics.observe("first_token", time.perf_counter() - started)
+        pieces.append(token)
+        yield token
+    metrics.observe("generate", time.perf_counter() - start)
+    answer = "".join(pieces)
+    metrics.increment("completion_tokens", estimate_tokens(answer))
+    answer_cache.put(question, embedding, answer, index_version=index_version)
+
+def source_fingerprint(documents):
+    """``{source: content hash}`` of retrieved chunks; posts are keyed individually, files by path."""
+    sources = {}
+    for doc in documents:
+        meta = doc.metadata or {}
+        key = f"{meta['collection']}:{meta['post_id']}" if meta.get("post_id") else meta.get("source_key")
+        if key:
+            sources[key] = meta.get("source_sha256")
+    return sources
+
+def get_retrieval_sources(questions):
+    """Sources retrieval would use for each question right now, without generating anything.
+
+    Precomputed answers record this at generation time and are stale once it changes.
+    """
+    with metrics.timer("embed_batch"):
+        vectors = embeddings.embed_documents([normalize_question(question) for question in questions])
+    results = []
+    for question, embedding in zip(questions, vectors):
+        documents = retrieve_documents(question, embedding) if router.needs_retrieval(embedding) else []
+        results.append({"question": question, "sources": source_fingerprint(documents)})
+    return results
+
+def chatbot_info():
+    return {"model": LLM_MODEL if LLM_BACKEND == "ollama" else LLM_BACKEND, "prompt_version": PROMPT_VERSION, "index_version": current_index_version()}
+
 @app.route("/chatbot_response", methods=["POST"])
 def chatbot_response():
     data = request.get_json()
     question = data.get("question")
     if not question:
         return jsonify({"error": "No question provided"}), 400
-    answer = get_chatbot_response(question)
+    answer = get_chatbot_response(question, request_priority())
     return jsonify({"answer": answer})
 
+@app.route("/chatbot_response/batch", methods=["POST"])
+def chatbot_response_batch():
+    data = request.get_json()
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "No questions provided"}), 400
+    if len(questions) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} questions per batch"}), 400
+    return jsonify({"results": get_chatbot_responses(questions), "meta": chatbot_info()})
+
+@app.route("/chatbot_sources/batch", methods=["POST"])
+def chatbot_sources_batch():
+    data = request.get_json()
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "No questions provided"}), 400
+    if len(questions) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} questions per batch"}), 400
+    return jsonify({"results": get_retrieval_sources(questions), "meta": chatbot_info()})
+
+@app.route("/chatbot_info")
+def chatbot_info_route():
+    return jsonify(chatbot_info())
+
+@app.route("/chatbot_response/stream", methods=["POST"])
+def chatbot_response_stream():
+    data = request.get_json()
+    question = data.get("question")
+    if not question:
+        return jsonify({"error": "No question provided"}), 400
+
+    tokens, close = stream_chatbot_response(question, request_priority())
+
+    # Chunked JSON lines: {"token": ...} per token, then {"done": true} or {"error": ...}
+    def generate():
+        try:
+            for token in tokens:
+                yield json.dumps({"token": token}) + "\n"
+            yield json.dumps({"done": True}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    # The server closes the response when the stream ends or the client goes away
+    response.call_on_close(close)
+    return response
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify({
+        **answer_cache.stats(),
+        "single_flight": in_flight.stats(),
+        "faq": faq_index.stats() if faq_index is not None else None,
+    })
+
+@app.route("/metrics")
+def metrics_prometheus():
+    return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/summary")
+def metrics_summary():
+    # Same data as /metrics with p50/p95/p99 over the most recent samples of each stage
+    return jsonify(metrics.summary())
+
+@app.route("/serving/stats")
+def serving_stats():
+    return jsonify(admission.stats())
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+@app.route("/cache/invalidate", methods=["POST"])
+def cache_invalidate():
+    answer_cache.invalidate()
+    return jsonify(answer_cache.stats())
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: the process is up; only a failed warm-up means it should be restarted
+    status = 500 if startup["state"] == "failed" else 200
+    return jsonify({"state": startup["state"], "error": startup["error"]}), status
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: route traffic here only once every model and index is loaded
+    return jsonify({**startup, "uptime": time.time() - startup["started_at"] if startup["started_at"] else None}), 200 if ready.is_set() else 503
+
 @app.route("/")
 def home():
     return jsonify({"message": "Welcome to the AI-Grow Chatbot API!"})
 
 if __name__ == "__main__":
+    # With the debug reloader only the serving child process loads models
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
     app.run(debug=True, port=PORT)
 
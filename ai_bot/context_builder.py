@@ -0,0 +1,73 @@
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def format_message(msg):
+    return f"{msg['origin']}: {msg['message']}"
+
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", """
+    You maintain a running summary of a conversation between a user and an engagement assistant.
+    Merge the new lines into the existing summary, keeping facts, names and open questions.
+    Answer with the updated summary only, in at most {max_words} words.
+    """),
+    ("human", "Existing summary:\n{summary}\n\nNew lines:\n{lines}")
+])
+
+
+def create_summarizer(llm, max_words=120):
+    chain = summary_prompt | llm | StrOutputParser()
+    return lambda summary, lines: chain.invoke({"summary": summary or "(empty)", "lines": lines, "max_words": max_words})
+
+
+class ConversationContext:
+    """Builds the prompt context from chat history within a fixed token budget.
+
+    The last ``recent_turns`` turns are kept verbatim (fewer if they do not fit in
+    ``token_budget``); everything older is folded into a rolling summary. Only newly
+    evicted messages are sent to the summarizer, and eviction happens ``fold_turns``
+    turns at a time so the summarizer runs every few turns rather than on every one.
+    """
+
+    def __init__(self, summarize, token_budget=1024, recent_turns=6, fold_turns=3):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.fold_turns = fold_turns
+        self.reset()
+
+    def reset(self):
+        self.summary = ""
+        self.summarized_count = 0
+
+    def _window_start(self, history):
+        start = max(self.summarized_count, len(history) - 2 * self.recent_turns)
+        budget = self.token_budget - estimate_tokens(self.summary)
+        used = sum(estimate_tokens(format_message(msg)) for msg in history[start:])
+        while start < len(history) and used > budget:
+            used -= estimate_tokens(format_message(history[start]))
+            start += 1
+        return start
+
+    def build(self, history):
+        if len(history) < self.summarized_count:
+            # History was cleared or replaced; the cached summary no longer applies
+            self.reset()
+
+        start = self._window_start(history)
+        if start > self.summarized_count:
+            start = max(start, min(self.summarized_count + 2 * self.fold_turns, len(history) - 2))
+            evicted = "\n".join(format_message(msg) for msg in history[self.summarized_count:start])
+            self.summary = self.summarize(self.summary, evicted)
+            self.summarized_count = start
+
+        recent = "\n".join(format_message(msg) for msg in history[self.summarized_count:])
+        if self.summary:
+            return f"Summary of earlier conversation: {self.summary}\n{recent}"
+        return recent
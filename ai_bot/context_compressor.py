@@ -0,0 +1,75 @@
+import re
+import numpy as np
+from answer_cache import normalize_question
+from context_builder import estimate_tokens
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+MIN_OVERLAP_CHARS = 20
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def strip_overlap(previous, text, max_overlap):
+    """Drop the head of ``text`` that repeats the tail of ``previous`` (the splitter's chunk_overlap)."""
+    for size in range(min(max_overlap, len(previous), len(text)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return text
+
+
+class ContextCompressor:
+    """Shrinks retrieved chunks to the sentences that matter for the question.
+
+    Overlapping spans between chunks and repeated sentences are removed first;
+    the remaining sentences are embedded in one batch, ranked by cosine similarity
+    to the query embedding, and kept best-first until ``token_budget`` is spent.
+    Kept sentences are emitted in their original order so the context still reads
+    naturally. The best sentence is always kept, even below ``min_similarity``.
+    """
+
+    def __init__(self, embeddings, token_budget=200, min_similarity=0.2, max_overlap=200):
+        self.embeddings = embeddings
+        self.token_budget = token_budget
+        self.min_similarity = min_similarity
+        self.max_overlap = max_overlap
+
+    def sentences(self, documents):
+        seen, sentences, texts = set(), [], []
+        for doc_idx, doc in enumerate(documents):
+            text = doc.page_content
+            for previous in texts:
+                text = strip_overlap(previous, text, self.max_overlap)
+            texts.append(doc.page_content)
+            for sentence in split_sentences(text):
+                key = normalize_question(sentence)
+                if key and key not in seen:
+                    seen.add(key)
+                    sentences.append((doc_idx, sentence))
+        return sentences
+
+    def compress(self, question, embedding, documents):
+        sentences = self.sentences(documents)
+        if not sentences:
+            return ""
+        vectors = np.asarray(self.embeddings.embed_documents([sentence for _, sentence in sentences]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ (query / (np.linalg.norm(query) or 1.0))
+
+        kept, used = set(), 0
+        for i in np.argsort(-scores):
+            if kept and scores[i] < self.min_similarity:
+                break
+            tokens = estimate_tokens(sentences[i][1])
+            if kept and used + tokens > self.token_budget:
+                continue
+            kept.add(int(i))
+            used += tokens
+
+        blocks = {}
+        for i in sorted(kept):
+            doc_idx, sentence = sentences[i]
+            blocks.setdefault(doc_idx, []).append(sentence)
+        return "\n\n".join(" ".join(block) for block in blocks.values())
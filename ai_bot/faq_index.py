@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+import numpy as np
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+class FaqIndex:
+    """Answers questions straight from the scraped ``miniso_qa_data`` pairs.
+
+    Lookup tries an exact match on the normalized question, then the nearest FAQ
+    question by cosine similarity above ``threshold``. Questions that were scraped
+    with more than one distinct answer are ambiguous and left to the LLM.
+
+    The collection is polled for changes (document count, newest ``_id`` and
+    ``updated_at``) at most every ``refresh_seconds``; when it changed, the index
+    is rebuilt in a background thread while lookups keep using the old one.
+    """
+
+    def __init__(self, embeddings, collection, threshold=0.9, refresh_seconds=300):
+        self.embeddings = embeddings
+        self.collection = collection
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = 0.0
+        self.fingerprint = None
+        self.keys, self.answers, self.matrix, self.exact = [], [], None, {}
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "refreshes": 0}
+        self.refresh()
+
+    def _fingerprint(self):
+        newest = list(self.collection.find({}, {"_id": 1}).sort("_id", -1).limit(1))
+        updated = list(self.collection.find({"updated_at": {"$exists": True}}, {"updated_at": 1}).sort("updated_at", -1).limit(1))
+        return (
+            self.collection.count_documents({}),
+            str(newest[0]["_id"]) if newest else None,
+            str(updated[0]["updated_at"]) if updated else None,
+        )
+
+    def refresh(self):
+        try:
+            fingerprint = self._fingerprint()
+            if fingerprint == self.fingerprint:
+                return
+            pairs = {}
+            for doc in self.collection.find({}, {"question": 1, "answer": 1}):
+                key = normalize_question(doc.get("question") or "")
+                if key and doc.get("answer"):
+                    pairs.setdefault(key, set()).add(doc["answer"].strip())
+            unambiguous = {key: answers.pop() for key, answers in pairs.items() if len(answers) == 1}
+            keys = list(unambiguous)
+            matrix = np.asarray(self.embeddings.embed_documents(keys), dtype=np.float32) if keys else None
+            if matrix is not None:
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            with self._lock:
+                self.keys, self.answers, self.matrix = keys, [unambiguous[key] for key in keys], matrix
+                self.exact = {key: i for i, key in enumerate(keys)}
+                self.fingerprint = fingerprint
+                self.counters["refreshes"] += 1
+            logger.info(f"FAQ index loaded {len(keys)} questions ({len(pairs) - len(keys)} ambiguous skipped)")
+        except Exception:
+            # A Mongo outage must not take the chatbot down; keep serving the previous index
+            logger.exception("FAQ index refresh failed")
+        finally:
+            self._checked_at = time.time()
+            self._refreshing = False
+
+    def _maybe_refresh(self):
+        if self._refreshing or time.time() - self._checked_at < self.refresh_seconds:
+            return
+        self._refreshing = True
+        threading.Thread(target=self.refresh, name="faq-refresh", daemon=True).start()
+
+    def lookup(self, question, embedding):
+        """Return ``{"answer", "question", "score", "match"}`` for a confident FAQ match, else None."""
+        self._maybe_refresh()
+        with self._lock:
+            i = self.exact.get(normalize_question(question))
+            if i is not None:
+                self.counters["exact_hits"] += 1
+                return {"answer": self.answers[i], "question": self.keys[i], "score": 1.0, "match": "exact"}
+            if self.matrix is not None:
+                vector = np.asarray(embedding, dtype=np.float32)
+                scores = self.matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+                i = int(np.argmax(scores))
+                if scores[i] >= self.threshold:
+                    self.counters["near_hits"] += 1
+                    return {"answer": self.answers[i], "question": self.keys[i], "score": float(scores[i]), "match": "nearest"}
+            self.counters["misses"] += 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "questions": len(self.keys), "threshold": self.threshold}
@@ -0,0 +1,129 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "miniso.db"))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+
+
+class HistoryStore:
+    """Session-keyed, append-only chat history in SQLite (WAL mode).
+
+    Appends are single-row inserts and reads fetch one page through the
+    (session_id, id) index, so cost no longer grows with conversation length and
+    concurrent sessions never overwrite each other.
+    """
+
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._create_table()
+
+    def _connect(self):
+        # sqlite3 connections are per-thread; Streamlit and Flask serve sessions from a thread pool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_table(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    origin TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id)")
+
+    def append(self, session_id, origin, message):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO chat_messages (session_id, origin, message) VALUES (?, ?, ?)",
+                (session_id, origin, message),
+            )
+        return cursor.lastrowid
+
+    def append_many(self, session_id, messages):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, origin, message) VALUES (?, ?, ?)",
+                [(session_id, msg["origin"], msg["message"]) for msg in messages],
+            )
+
+    def recent(self, session_id, limit=HISTORY_PAGE_SIZE, before_id=None):
+        """Return up to ``limit`` messages older than ``before_id`` (newest page by default), oldest first."""
+        query = "SELECT id, origin, message, timestamp FROM chat_messages WHERE session_id = ?"
+        params = [session_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def count(self, session_id):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+
+    def clear(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+
+    def compact(self, keep_last=500):
+        """Drop all but the newest ``keep_last`` messages of every session and shrink the WAL."""
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute('''
+                DELETE FROM chat_messages WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id DESC) AS rank
+                        FROM chat_messages
+                    ) WHERE rank > ?
+                )
+            ''', (keep_last,)).rowcount
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def import_json(self, session_id, path):
+        """Load a legacy chat_history.json file into a session."""
+        with open(path, "r") as f:
+            history = json.load(f)
+        self.append_many(session_id, history)
+        return len(history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the chat history store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import a legacy chat_history.json file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--session", default="legacy")
+    compact_parser = subparsers.add_parser("compact", help="Keep only the newest messages per session")
+    compact_parser.add_argument("--keep-last", type=int, default=500)
+    args = parser.parse_args()
+
+    store = HistoryStore()
+    if args.command == "import":
+        print(f"Imported {store.import_json(args.session, args.path)} messages into session '{args.session}'")
+    else:
+        print(f"Compacted history, removed {store.compact(args.keep_last)} messages")
+
+
+if __name__ == "__main__":
+    main()
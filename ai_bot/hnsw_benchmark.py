@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+import numpy as np
+from index_store import CHROMA_DIR, HNSW_SPACE, hnsw_metadata
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def load_corpus(persist_dir=CHROMA_DIR, synthetic=0, dim=384, seed=0):
+    """Vectors from the chatbot's persisted index, or ``synthetic`` random unit vectors."""
+    if synthetic:
+        vectors = np.random.default_rng(seed).standard_normal((synthetic, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    from index_store import open_index
+    stored = open_index(persist_dir=persist_dir).get(include=["embeddings"])
+    return np.asarray(stored["embeddings"], dtype=np.float32)
+
+
+def sample_queries(corpus, count, noise=0.05, seed=0):
+    # Perturbed corpus vectors: realistic neighbourhoods without needing held-out questions
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), count)] + rng.normal(0, noise, (count, corpus.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_neighbours(corpus, queries, k, space):
+    if space == "l2":
+        scores = -((queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1))
+    elif space == "cosine":
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ (corpus / np.linalg.norm(corpus, axis=1, keepdims=True)).T
+    else:
+        scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def benchmark_setting(corpus, queries, truth, k, metadata, batch_size=5000):
+    import chromadb
+
+    workdir = tempfile.mkdtemp(prefix="hnsw-bench-")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        collection = client.create_collection("bench", metadata=metadata)
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), batch_size):
+            rows = corpus[offset:offset + batch_size]
+            collection.add(ids=[str(i) for i in range(offset, offset + len(rows))], embeddings=rows.tolist())
+        build_seconds = time.perf_counter() - start
+        rss_after = rss_bytes()
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            hits += len(set(map(int, result["ids"][0])) & set(expected.tolist()))
+
+        latencies = np.asarray(latencies) * 1000
+        return {
+            **metadata,
+            f"recall@{k}": hits / (len(queries) * k),
+            "build_seconds": build_seconds,
+            "latency_ms": {"mean": float(latencies.mean()), "p50": float(np.percentile(latencies, 50)),
+                           "p95": float(np.percentile(latencies, 95)), "p99": float(np.percentile(latencies, 99))},
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "disk_bytes": directory_bytes(workdir),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall@k, latency and memory of Chroma HNSW settings against brute force.")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR, help="Index whose vectors form the corpus")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the persisted index")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", nargs="+", default=[HNSW_SPACE], choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--output", default="hnsw_benchmark.json")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.persist_dir, args.synthetic, args.dim)
+    if len(corpus) <= args.k:
+        parser.error(f"Corpus has only {len(corpus)} vectors; need more than k={args.k}")
+    queries = sample_queries(corpus, args.queries)
+    print(f"Corpus: {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    results = []
+    for space in args.space:
+        truth = exact_neighbours(corpus, queries, args.k, space)
+        for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+            result = benchmark_setting(corpus, queries, truth, args.k, hnsw_metadata(space, m, construction_ef, search_ef))
+            results.append(result)
+            print(
+                f"space={space} M={m} construction_ef={construction_ef} search_ef={search_ef}: "
+                f"recall@{args.k}={result[f'recall@{args.k}']:.3f} p50={result['latency_ms']['p50']:.2f}ms "
+                f"p95={result['latency_ms']['p95']:.2f}ms build={result['build_seconds']:.1f}s disk={result['disk_bytes'] / 1e6:.1f}MB"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump({"corpus": len(corpus), "dim": int(corpus.shape[1]), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+    print(f"Results written to {args.output}; set HNSW_SPACE / HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF to apply")
+
+
+if __name__ == "__main__":
+    main()
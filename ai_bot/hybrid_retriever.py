@@ -0,0 +1,231 @@
+import re
+import math
+import logging
+import threading
+from array import array
+from collections import Counter, defaultdict
+import numpy as np
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    # Keeps SKU-like tokens ("mn-2041", "v2.0") intact instead of splitting on punctuation
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring over the chunks stored in Chroma.
+
+    Postings are packed into flat numpy arrays (CSR layout: one offset range per
+    term) instead of per-posting Python tuples, about 6 bytes per posting.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        # array('i') keeps the build at 4 bytes per posting instead of a Python int object
+        term_ids, doc_ids, tfs, lengths = array("i"), array("i"), array("i"), array("i")
+        for doc_idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_idx)
+                tfs.append(tf)
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.frombuffer(doc_ids, dtype=np.int32)[order]
+        self.tfs = np.minimum(np.frombuffer(tfs, dtype=np.int32), np.iinfo(np.uint16).max).astype(np.uint16)[order]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.offsets[1:])
+        self.doc_lengths = np.frombuffer(lengths, dtype=np.int32).copy()
+        self.doc_count = len(self.doc_lengths)
+        self.avg_length = float(self.doc_lengths.mean()) if self.doc_count else 0.0
+
+    def postings(self, term):
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return self.doc_ids[:0], self.tfs[:0]
+        start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:stop], self.tfs[start:stop]
+
+    def idf(self, term):
+        df = len(self.postings(term)[0])
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=20):
+        matched, partial = [], []
+        for term in set(tokenize(query)):
+            doc_ids, tfs = self.postings(term)
+            if not len(doc_ids):
+                continue
+            tfs = tfs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_ids] / (self.avg_length or 1))
+            matched.append(doc_ids)
+            partial.append(self.idf(term) * tfs * (self.k1 + 1) / (tfs + norm))
+        if not matched:
+            return []
+        docs, inverse = np.unique(np.concatenate(matched), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(partial))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(docs[i]), float(scores[i])) for i in top]
+
+
+def stored_chunks(db, page_size=5000):
+    """Yield ``(id, text)`` for every chunk, a page at a time so the collection's text is never held at once."""
+    offset = 0
+    while True:
+        page = db.get(include=["documents"], limit=page_size, offset=offset)
+        yield from zip(page["ids"], page["documents"])
+        offset += len(page["ids"])
+        if len(page["ids"]) < page_size:
+            return
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """Merge ranked id lists; each list contributes 1 / (k + rank) per id."""
+    scores = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class Corpus:
+    """Chunk ids and BM25 postings of one index version, swapped in as a unit.
+
+    Texts and metadata are not kept: only the handful of chunks that reach the
+    reranker are read back per request. Ids are packed into one fixed-width bytes
+    array rather than a list of Python strings. ``snapshot`` is the quantized export
+    the corpus was read from, if any, so dense search and BM25 always see the same
+    version.
+    """
+
+    def __init__(self, chunks, index_version, snapshot=None):
+        ids = []
+
+        def texts():
+            for doc_id, text in chunks:
+                ids.append(doc_id.encode("utf-8"))
+                yield text
+        self.bm25 = BM25Index(texts())
+        self.ids = np.array(ids, dtype=bytes) if ids else np.empty(0, dtype="S1")
+        self.index_version = index_version
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return len(self.ids)
+
+    def id_at(self, doc_idx):
+        return self.ids[doc_idx].decode("utf-8")
+
+
+class HybridRetriever:
+    """Dense (Chroma) + sparse (BM25) retrieval fused with RRF, then trimmed by a reranker.
+
+    The BM25 index is rebuilt from the Chroma collection when the index version
+    changes, in a background thread; requests keep using the previous corpus until
+    the new one is swapped in. ``collection`` is the raw Chroma collection used for
+    dense search by embedding and to fetch the texts of the final candidates.
+    ``reranker_model`` names a sentence-transformers cross-encoder; when it is
+    empty the fused order is used as is. ``dense_index`` replaces Chroma entirely
+    with a quantized export (``QuantizedIndex``): its ``load(index_version)``
+    snapshot supplies the BM25 texts and the final chunks, and its ``search`` the
+    dense candidates.
+    """
+
+    def __init__(self, db, collection, candidates=20, top_n=3, rrf_k=60, reranker_model="", rerank_candidates=10, index_version=None, dense_index=None):
+        self.db = db
+        self.collection = collection
+        self.dense_index = dense_index
+        self.candidates = candidates
+        self.top_n = top_n
+        self.rrf_k = rrf_k
+        self.rerank_candidates = rerank_candidates
+        self._lock = threading.Lock()
+        self._requested = None
+        self._loader = None
+        self.reranker = None
+        if reranker_model:
+            from sentence_transformers import CrossEncoder
+            self.reranker = CrossEncoder(reranker_model, device="cpu")
+        # First load runs during warm-up, before any request is served
+        self.corpus = self._load(index_version)
+
+    def _load(self, index_version):
+        if self.dense_index is None:
+            return Corpus(stored_chunks(self.db), index_version)
+        snapshot = self.dense_index.load(index_version)
+        return Corpus(snapshot.chunks(), index_version, snapshot)
+
+    def _load_in_background(self):
+        # Single loader: keeps going until it has loaded the newest version requested
+        while True:
+            with self._lock:
+                index_version = self._requested
+                if index_version == self.corpus.index_version:
+                    self._loader = None
+                    return
+            try:
+                self.corpus = self._load(index_version)
+            except Exception:
+                logger.exception("Retrieval corpus reload failed")
+                with self._lock:
+                    # The next request that still sees a newer version retries
+                    self._requested = self.corpus.index_version
+                    self._loader = None
+                return
+
+    def refresh(self, index_version=None):
+        if index_version in (None, self.corpus.index_version):
+            return
+        with self._lock:
+            self._requested = index_version
+            if self._loader is not None:
+                return
+            self._loader = threading.Thread(target=self._load_in_background, name="bm25-reload", daemon=True)
+            self._loader.start()
+
+    def dense_search(self, corpus, embedding):
+        if not len(corpus):
+            return []
+        if corpus.snapshot is not None:
+            return self.dense_index.search(corpus.snapshot, embedding, self.candidates)
+        result = self.collection.query(query_embeddings=[embedding], n_results=min(self.candidates, len(corpus)), include=[])
+        return result["ids"][0]
+
+    def sparse_search(self, corpus, question):
+        return [corpus.id_at(doc_idx) for doc_idx, _ in corpus.bm25.search(question, self.candidates)]
+
+    def fetch(self, corpus, doc_ids):
+        """Texts and metadata of ``doc_ids`` in that order, skipping chunks no longer in the collection."""
+        if not doc_ids:
+            return []
+        if corpus.snapshot is not None:
+            return corpus.snapshot.fetch(doc_ids)
+        stored = self.collection.get(ids=doc_ids, include=["documents", "metadatas"])
+        found = {doc_id: (text, metadata) for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+        return [(doc_id, *found[doc_id]) for doc_id in doc_ids if doc_id in found]
+
+    def rerank(self, question, candidates):
+        if self.reranker is None or len(candidates) <= self.top_n:
+            return candidates[:self.top_n]
+        scores = self.reranker.predict([(question, text) for _, text, _ in candidates])
+        ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)
+        return [candidate for candidate, _ in ranked[:self.top_n]]
+
+    def retrieve(self, question, embedding, index_version=None):
+        self.refresh(index_version)
+        # One corpus for the whole request, even if a reload swaps in a new one meanwhile
+        corpus = self.corpus
+        fused = reciprocal_rank_fusion([self.dense_search(corpus, embedding), self.sparse_search(corpus, question)], k=self.rrf_k)
+        # Rerank only the head of the fused list; the tail rarely survives and costs cross-encoder time.
+        # Chroma's dense ids can be newer than the loaded corpus while a reload runs, so the texts
+        # are read from the live collection and ids it no longer has are dropped here
+        candidates = self.fetch(corpus, fused[:self.rerank_candidates])
+        return [Document(page_content=text, metadata=metadata or {}) for _, text, metadata in self.rerank(question, candidates)]
@@ -0,0 +1,262 @@
+import os
+import json
+import uuid
+import hashlib
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# LangChain is imported inside the functions that need it so manifest helpers stay cheap to import
+
+# Persistent index configuration
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "knowledge_base")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+MANIFEST_FILE = "manifest.json"
+MANIFEST_LOCK_FILE = "manifest.lock"
+# Chroma HNSW parameters (Chroma's defaults); tune with hnsw_benchmark.py
+HNSW_SPACE = os.getenv("HNSW_SPACE", "l2")
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", 100))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", 10))
+
+
+def file_sha256(path):
+    """Hash a source file so unchanged documents are never re-embedded."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hnsw_metadata(space=HNSW_SPACE, m=HNSW_M, construction_ef=HNSW_CONSTRUCTION_EF, search_ef=HNSW_SEARCH_EF):
+    return {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+
+
+def index_settings(embedding_model=EMBEDDING_MODEL):
+    """Parameters that invalidate every stored chunk when any of them changes."""
+    return {
+        "collection": COLLECTION_NAME,
+        "embedding_model": embedding_model,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        # Chunk ids used to be content-only, so identical files overwrote each other's chunks
+        "chunk_ids": "source",
+        # Chroma fixes the graph parameters when a collection is created, so changing them means a rebuild;
+        # search_ef only affects queries and is applied in place by apply_search_ef()
+        "hnsw": {key: value for key, value in hnsw_metadata().items() if key != "hnsw:search_ef"},
+    }
+
+
+def load_manifest(persist_dir=CHROMA_DIR):
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"settings": {}, "sources": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, persist_dir=CHROMA_DIR):
+    # Write to a temp file first so an interrupted sync never leaves a torn manifest
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock shared by every process that opens ``path`` (no-op without fcntl)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def update_manifest(update, persist_dir=CHROMA_DIR):
+    """Apply ``update(manifest)`` to the manifest on disk and save it, under the manifest lock.
+
+    The chatbot, ingest.py and post_indexer.py write the same manifest from
+    different processes; re-reading under the lock keeps each one from saving a
+    stale copy over entries another has just written.
+    """
+    with file_lock(os.path.join(persist_dir, MANIFEST_LOCK_FILE)):
+        manifest = load_manifest(persist_dir)
+        update(manifest)
+        save_manifest(manifest, persist_dir)
+    return manifest
+
+
+def index_version(manifest):
+    """Short fingerprint of the index contents, used to invalidate anything derived from it."""
+    payload = json.dumps(
+        {"settings": manifest.get("settings", {}),
+         "sources": {key: entry["sha256"] for key, entry in manifest.get("sources", {}).items()}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def current_index_version(persist_dir=CHROMA_DIR):
+    return index_version(load_manifest(persist_dir))
+
+
+def source_key(path):
+    return os.path.abspath(path)
+
+
+def load_documents(path):
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+    loader = PyPDFLoader(path) if path.lower().endswith(".pdf") else TextLoader(path, encoding="utf-8")
+    return loader.load()
+
+
+def split_documents(documents):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return splitter.split_documents(documents)
+
+
+def chunk_ids(key, sha256, count):
+    # The source key keeps identical files from sharing (and overwriting) each other's chunks
+    prefix = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    return [f"{prefix}-{sha256[:16]}-{i}" for i in range(count)]
+
+
+def open_client(persist_dir=CHROMA_DIR):
+    import chromadb
+    # Chroma shares one client per path, so the LangChain store and raw collection handles see the same data
+    return chromadb.PersistentClient(path=persist_dir)
+
+
+def open_index(embeddings=None, persist_dir=CHROMA_DIR):
+    from langchain_community.vectorstores import Chroma
+    if embeddings is None:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    return Chroma(
+        client=open_client(persist_dir),
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
+        collection_metadata=hnsw_metadata(),
+    )
+
+
+def open_collection(persist_dir=CHROMA_DIR):
+    """The raw Chroma collection, for queries by precomputed embedding that return ids only."""
+    return open_client(persist_dir).get_collection(COLLECTION_NAME, embedding_function=None)
+
+
+def apply_search_ef(collection, search_ef=HNSW_SEARCH_EF):
+    """Update the query-time HNSW ef of an existing collection without re-embedding anything."""
+    metadata = dict(collection.metadata or {})
+    if metadata.get("hnsw:search_ef") == search_ef:
+        return
+    try:
+        # Chroma >= 1.0 takes HNSW changes through the collection configuration
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except TypeError:
+        metadata["hnsw:search_ef"] = search_ef
+        collection.modify(metadata=metadata)
+
+
+def add_chunks(db, chunks, ids, key, sha256=None):
+    for chunk in chunks:
+        chunk.metadata["source_key"] = key
+        if sha256:
+            chunk.metadata["source_sha256"] = sha256
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        db.add_documents(chunks[start:start + EMBED_BATCH_SIZE], ids=ids[start:start + EMBED_BATCH_SIZE])
+
+
+def remove_source(db, key):
+    stale_ids = db.get(where={"source_key": key})["ids"]
+    if stale_ids:
+        db.delete(ids=stale_ids)
+    return len(stale_ids)
+
+
+def sync_source(db, manifest, path, persist_dir=CHROMA_DIR, owner="chatbot"):
+    """Embed a source only when its content hash differs from the manifest entry."""
+    key = source_key(path)
+    sha256 = file_sha256(path)
+    entry = manifest["sources"].get(key)
+    if entry and entry["sha256"] == sha256:
+        return False
+
+    chunks = split_documents(load_documents(path))
+    remove_source(db, key)
+    add_chunks(db, chunks, chunk_ids(key, sha256, len(chunks)), key, sha256)
+
+    manifest["sources"][key] = {"sha256": sha256, "chunks": len(chunks), "owner": owner}
+
+    def record(current):
+        current["sources"][key] = manifest["sources"][key]
+    update_manifest(record, persist_dir)
+    return True
+
+
+def prune_sources(db, manifest, owner, keep=None, persist_dir=CHROMA_DIR):
+    """Drop ``owner``'s sources whose file is gone or, when ``keep`` is given, that are not in it.
+
+    Each entry point only prunes what it indexed itself, so the chatbot's
+    PDF_FILE never removes ingest.py documents or MongoDB posts.
+    """
+    stale = [
+        key for key, entry in manifest["sources"].items()
+        if entry.get("owner") == owner and (not os.path.exists(key) or (keep is not None and key not in keep))
+    ]
+    for key in stale:
+        remove_source(db, key)
+        del manifest["sources"][key]
+
+    def forget(current):
+        for key in stale:
+            current["sources"].pop(key, None)
+    if stale:
+        update_manifest(forget, persist_dir)
+    return stale
+
+
+def open_checked_index(embeddings, embedding_model=EMBEDDING_MODEL, persist_dir=CHROMA_DIR):
+    """Open the index and its manifest, wiping both if the index settings changed."""
+    db = open_index(embeddings, persist_dir)
+    settings = index_settings(embedding_model)
+    # Held across the check and the wipe so a concurrent writer cannot record sources in between
+    with file_lock(os.path.join(persist_dir, MANIFEST_LOCK_FILE)):
+        manifest = load_manifest(persist_dir)
+        if manifest.get("settings") != settings:
+            # Chunking or embedding model changed: every stored vector is stale
+            db.delete_collection()
+            db = open_index(embeddings, persist_dir)
+            # index_id tells incremental indexers that state recorded before the wipe is void
+            manifest = {"settings": settings, "sources": {}, "index_id": uuid.uuid4().hex}
+            save_manifest(manifest, persist_dir)
+    apply_search_ef(open_collection(persist_dir))
+    return db, manifest
+
+
+def load_or_build_index(paths, embeddings=None, embedding_model=EMBEDDING_MODEL, persist_dir=CHROMA_DIR):
+    """Open the persisted index and re-embed only new or changed sources."""
+    if embeddings is None:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        embeddings = SentenceTransformerEmbeddings(model_name=embedding_model)
+    db, manifest = open_checked_index(embeddings, embedding_model, persist_dir)
+    for path in paths:
+        if sync_source(db, manifest, path, persist_dir):
+            print(f"Indexed {path} ({manifest['sources'][source_key(path)]['chunks']} chunks)")
+    for key in prune_sources(db, manifest, "chatbot", {source_key(path) for path in paths}, persist_dir):
+        print(f"Removed {key} from the index")
+    return db
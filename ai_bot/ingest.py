@@ -0,0 +1,148 @@
+import os
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+from index_store import (
+    CHROMA_DIR, EMBEDDING_MODEL, EMBED_BATCH_SIZE,
+    file_sha256, source_key, load_documents, split_documents, chunk_ids,
+    open_checked_index, load_manifest, update_manifest, remove_source, prune_sources,
+)
+
+load_dotenv()
+
+INGEST_EXTENSIONS = tuple(os.getenv("INGEST_EXTENSIONS", ".pdf,.txt,.md").split(","))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+
+def expand_sources(patterns, extensions=INGEST_EXTENSIONS):
+    """Resolve directories (recursively) and glob patterns into a sorted list of source files."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def extract_source(path):
+    """Runs in a worker process: hash, load and chunk one source file."""
+    sha256 = file_sha256(path)
+    pages = load_documents(path)
+    return path, sha256, len(pages), split_documents(pages)
+
+
+class Ingestor:
+    """Embeds extracted chunks in large batches that may span several sources.
+
+    A source is written to the manifest only after all of its chunks are stored,
+    so an interrupted run leaves it unrecorded and the next run redoes just that
+    source (its partial chunks are removed first).
+    """
+
+    def __init__(self, db, persist_dir=CHROMA_DIR, batch_size=EMBED_BATCH_SIZE):
+        self.db = db
+        self.persist_dir = persist_dir
+        self.batch_size = batch_size
+        self.buffer = []
+        self.remaining = {}
+        self.stats = {"sources": 0, "pages": 0, "chunks": 0, "embed_seconds": 0.0}
+
+    def add(self, path, sha256, pages, chunks):
+        key = source_key(path)
+        remove_source(self.db, key)
+        for chunk in chunks:
+            chunk.metadata["source_key"] = key
+            chunk.metadata["source_sha256"] = sha256
+        self.remaining[key] = [len(chunks), {"sha256": sha256, "chunks": len(chunks), "owner": "ingest"}]
+        self.buffer.extend(zip(chunks, chunk_ids(key, sha256, len(chunks)), [key] * len(chunks)))
+        self.stats["pages"] += pages
+        if not chunks:
+            self._complete([key])
+        while len(self.buffer) >= self.batch_size:
+            self.flush(self.batch_size)
+
+    def flush(self, size=None):
+        batch, self.buffer = self.buffer[:size or len(self.buffer)], self.buffer[size or len(self.buffer):]
+        if not batch:
+            return
+        chunks, ids, keys = zip(*batch)
+        start = time.perf_counter()
+        self.db.add_documents(list(chunks), ids=list(ids))
+        self.stats["embed_seconds"] += time.perf_counter() - start
+        self.stats["chunks"] += len(chunks)
+
+        done = []
+        for key in keys:
+            self.remaining[key][0] -= 1
+            if self.remaining[key][0] == 0:
+                done.append(key)
+        self._complete(done)
+
+    def _complete(self, keys):
+        if not keys:
+            return
+        entries = {key: self.remaining.pop(key)[1] for key in keys}
+
+        def record(manifest):
+            manifest["sources"].update(entries)
+        update_manifest(record, self.persist_dir)
+        self.stats["sources"] += len(entries)
+
+
+def ingest(patterns, workers=INGEST_WORKERS, batch_size=EMBED_BATCH_SIZE, embedding_model=EMBEDDING_MODEL, persist_dir=CHROMA_DIR, prune=False):
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+    started = time.perf_counter()
+    embeddings = SentenceTransformerEmbeddings(model_name=embedding_model)
+    db, manifest = open_checked_index(embeddings, embedding_model, persist_dir)
+
+    paths = expand_sources(patterns)
+    indexed = manifest["sources"]
+    # Unchanged sources are never sent to the pool
+    todo = [path for path in paths if indexed.get(source_key(path), {}).get("sha256") != file_sha256(path)]
+    print(f"{len(paths)} sources found, {len(paths) - len(todo)} unchanged, {len(todo)} to ingest")
+
+    ingestor = Ingestor(db, persist_dir, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_source, path): path for path in todo}
+        for future in as_completed(futures):
+            try:
+                path, sha256, pages, chunks = future.result()
+            except Exception as e:
+                print(f"Skipping {futures[future]}: {e}")
+                continue
+            ingestor.add(path, sha256, pages, chunks)
+    ingestor.flush()
+    # Deleted files always leave the index; with --prune so do files these patterns no longer match
+    keep = {source_key(path) for path in paths} if prune else None
+    removed = prune_sources(db, load_manifest(persist_dir), "ingest", keep, persist_dir)
+
+    elapsed = time.perf_counter() - started
+    stats = {**ingestor.stats, "removed": len(removed), "seconds": elapsed}
+    stats["pages_per_second"] = stats["pages"] / elapsed if elapsed else 0.0
+    stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest PDFs and text files into the chatbot's persistent vector index.")
+    parser.add_argument("sources", nargs="+", help="Files, directories or glob patterns (quote globs)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Processes used for page extraction")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call")
+    parser.add_argument("--prune", action="store_true", help="Remove previously ingested files these sources no longer include")
+    args = parser.parse_args()
+
+    stats = ingest(args.sources, workers=args.workers, batch_size=args.batch_size, prune=args.prune)
+    print(
+        f"Ingested {stats['sources']} sources ({stats['removed']} removed): {stats['pages']} pages, {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+        f"({stats['pages_per_second']:.1f} pages/s, {stats['chunks_per_second']:.1f} chunks/s; "
+        f"embedding {stats['embed_seconds']:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
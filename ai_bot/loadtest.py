@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(BOT_DIR, "..", "chat_history.json")
+# Small fixed corpus: indexing input.pdf would make start-up time depend on the PDF parser
+DEFAULT_CORPUS = os.path.join(BOT_DIR, "fixtures", "loadtest_corpus.txt")
+READY_TIMEOUT = 300
+
+SYNTHETIC_TEMPLATES = (
+    "What do customers think of Miniso {product}?",
+    "How can we boost engagement for our {product} posts on {platform}?",
+    "Which {product} products trend best on {platform}?",
+    "Give me a catchy caption for a {product} launch.",
+    "Why are {product} sales dropping on {platform}?",
+)
+SYNTHETIC_PRODUCTS = ("plush toys", "earbuds", "fragrances", "stationery", "bags", "phone cases", "skincare")
+SYNTHETIC_PLATFORMS = ("Instagram", "Reddit", "Quora", "Facebook")
+
+
+def synthetic_questions(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(SYNTHETIC_TEMPLATES).format(product=rng.choice(SYNTHETIC_PRODUCTS), platform=rng.choice(SYNTHETIC_PLATFORMS))
+        for _ in range(count)
+    ]
+
+
+def load_questions(source, count, seed=0):
+    """Questions from chat_history.json (human turns), a JSONL file, or the synthetic generator."""
+    if source == "synthetic":
+        return synthetic_questions(count, seed)
+    with open(source, "r") as f:
+        if source.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+            questions = [row.get("question") or row.get("title") or row.get("message") for row in rows]
+        else:
+            questions = [msg["message"] for msg in json.load(f) if msg.get("origin") == "human"]
+    questions = [question for question in questions if question]
+    if not questions:
+        raise ValueError(f"No questions found in {source}")
+    # Replay in file order, wrapping around, so every run sends the same sequence
+    return [questions[i % len(questions)] for i in range(count)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env_overrides):
+    env = {**os.environ, **env_overrides, "CHATBOT_PORT": str(port)}
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        cwd=BOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_until_ready(base_url, process=None, timeout=READY_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Chatbot server exited with code {process.returncode}")
+        try:
+            response = requests.get(f"{base_url}/readyz", timeout=2)
+            if response.status_code == 200:
+                return response.json()
+            if response.json().get("state") == "failed":
+                raise RuntimeError(f"Chatbot warm-up failed: {response.json().get('error')}")
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Chatbot not ready after {timeout}s")
+
+
+class MemorySampler(threading.Thread):
+    """Samples the server's resident set size from /proc (Linux only)."""
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def rss_bytes(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+
+    def run(self):
+        while not self._done.is_set():
+            rss = self.rss_bytes()
+            if rss is not None:
+                self.samples.append(rss)
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        if not self.samples:
+            return None
+        return {"start_rss_bytes": self.samples[0], "peak_rss_bytes": max(self.samples), "end_rss_bytes": self.samples[-1]}
+
+
+def send_question(base_url, question, stream=True):
+    start = time.perf_counter()
+    result = {"ok": False, "status": None, "latency": None, "ttft": None}
+    try:
+        if stream:
+            with requests.post(f"{base_url}/chatbot_response/stream", json={"question": question}, stream=True, timeout=300) as response:
+                result["status"] = response.status_code
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        event = json.loads(line) if line else {}
+                        if "token" in event and result["ttft"] is None:
+                            result["ttft"] = time.perf_counter() - start
+                        if "error" in event:
+                            break
+                        if event.get("done"):
+                            result["ok"] = True
+        else:
+            response = requests.post(f"{base_url}/chatbot_response", json={"question": question}, timeout=300)
+            result["status"] = response.status_code
+            result["ok"] = response.status_code == 200
+    except requests.RequestException:
+        pass
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def percentiles(values, quantiles=(0.5, 0.95, 0.99)):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return {f"p{int(q * 100)}": None for q in quantiles}
+    return {f"p{int(q * 100)}": values[min(len(values) - 1, int(q * len(values)))] for q in quantiles}
+
+
+def run_load(base_url, questions, concurrency, stream=True):
+    """Closed-loop load: ``concurrency`` clients each send their next question as soon as the last returns."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda question: send_question(base_url, question, stream), questions))
+    elapsed = time.perf_counter() - start
+
+    ok = [result for result in results if result["ok"]]
+    statuses = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "status_counts": statuses,
+        "seconds": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency": percentiles(result["latency"] for result in ok),
+        "ttft": percentiles(result["ttft"] for result in ok) if stream else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible load test of the chatbot API with stub LLM and embedding backends.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="chat_history.json, a JSONL file, or 'synthetic'")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-stream", action="store_true", help="Use /chatbot_response instead of the streaming endpoint")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the answer cache so every request generates")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--real-backends", action="store_true", help="Keep Ollama and sentence-transformers instead of the stubs")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Document indexed by the started server (PDF_FILE)")
+    parser.add_argument("--vector-index", choices=("chroma", "quantized"), default="chroma", help="VECTOR_INDEX_MODE of the started server")
+    parser.add_argument("--chroma-dir", help="Reuse this index directory instead of a throwaway one, so RSS is measured without an indexing run in the server")
+    parser.add_argument("--ready-timeout", type=float, default=READY_TIMEOUT, help="Seconds to wait for warm-up; indexing a large --corpus takes longer")
+    parser.add_argument("--with-mongodb", action="store_true", help="Keep MONGODB_URI so the FAQ fast path queries the live database")
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=20)
+    parser.add_argument("--output-tokens", type=int, default=60)
+    parser.add_argument("--embed-ms", type=float, default=5)
+    parser.add_argument("--output", default=None, help="JSON report path (default: loadtest-<timestamp>.json)")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    questions = load_questions(args.source, args.requests, args.seed)
+    process, workdir = None, None
+    base_url = args.url
+    if base_url is None:
+        if args.chroma_dir is None:
+            workdir = tempfile.TemporaryDirectory(prefix="chatbot-loadtest-")
+        env = {
+            # Throwaway index so stub vectors never touch the real chroma_db
+            "CHROMA_DIR": os.path.abspath(args.chroma_dir) if args.chroma_dir else workdir.name,
+            "PDF_FILE": os.path.abspath(args.corpus),
+            "STUB_LLM_FIRST_TOKEN_MS": str(args.first_token_ms),
+            "STUB_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+            "STUB_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+            "STUB_EMBED_LATENCY_MS": str(args.embed_ms),
+            "MAX_QUEUE": str(max(args.concurrency, int(os.getenv("MAX_QUEUE", 32)))),
+            "VECTOR_INDEX_MODE": args.vector_index,
+        }
+        if not args.real_backends:
+            env.update(LLM_BACKEND="stub", EMBEDDING_BACKEND="stub", RERANKER_MODEL="")
+        if not args.with_mongodb:
+            # bot.py's load_dotenv() does not override variables already set, so this keeps .env's database out
+            env["MONGODB_URI"] = ""
+        if args.no_cache:
+            env["ANSWER_CACHE_MAX_ENTRIES"] = "0"
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process = start_server(port, env)
+
+    try:
+        started = time.perf_counter()
+        startup = wait_until_ready(base_url, process, args.ready_timeout)
+        time_to_ready = time.perf_counter() - started
+        sampler = MemorySampler(process.pid) if process else None
+        if sampler:
+            sampler.start()
+        report = run_load(base_url, questions, args.concurrency, stream=not args.no_stream)
+        report["memory"] = sampler.stop() if sampler else None
+        report["server_metrics"] = requests.get(f"{base_url}/metrics/summary", timeout=10).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if workdir is not None:
+            workdir.cleanup()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": config,
+        "time_to_ready_seconds": time_to_ready if process else None,
+        "startup": startup,
+        **report,
+    }
+    output = args.output or f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    latency, ttft = report["latency"], report["ttft"] or {}
+    print(
+        f"{report['succeeded']}/{report['requests']} ok, {report['throughput_rps']:.2f} req/s, "
+        f"latency p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}, ttft p50={ttft.get('p50')}"
+    )
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
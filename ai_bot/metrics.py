@@ -0,0 +1,106 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds; generation on CPU Ollama routinely takes tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RESERVOIR_SIZE = 2048
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size=RESERVOIR_SIZE):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=reservoir_size)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        samples = sorted(self.recent)
+        if not samples:
+            return {f"p{int(q * 100)}": None for q in quantiles}
+        return {f"p{int(q * 100)}": samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+
+class Metrics:
+    """In-process registry of per-stage latency histograms, counters and gauges.
+
+    Histograms and counters are keyed by a single label value (the stage or event
+    name). Gauges are callables evaluated at scrape time, so queue depth and cache
+    sizes are read from the components that own them rather than copied here.
+    """
+
+    def __init__(self, prefix="chatbot"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def _gauge_values(self):
+        values = {}
+        for name, fn in self.gauges.items():
+            try:
+                values[name] = fn()
+            except Exception:
+                values[name] = None
+        return values
+
+    def summary(self):
+        with self._lock:
+            stages = {
+                stage: {"count": h.count, "mean": h.sum / h.count if h.count else None, **h.percentiles()}
+                for stage, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+        return {"stages": stages, "counters": counters, "gauges": self._gauge_values()}
+
+    def prometheus(self):
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each request stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+            counters = sorted(self.counters.items())
+        for counter, value in counters:
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            lines.append(f"{self.prefix}_{counter}_total {value}")
+        for gauge, value in sorted(self._gauge_values().items()):
+            if value is not None:
+                lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+                lines.append(f"{self.prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,244 @@
+import os
+import json
+import hashlib
+import argparse
+import pymongo
+from datetime import datetime, timezone
+from bson import ObjectId
+from langchain_core.documents import Document
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from dotenv import load_dotenv
+from index_store import (
+    CHROMA_DIR, EMBEDDING_MODEL, EMBED_BATCH_SIZE,
+    open_checked_index, load_manifest, update_manifest, split_documents, add_chunks,
+)
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "company_data")
+POST_COLLECTIONS = os.getenv("POST_COLLECTIONS", "engagement_data,miniso_qa_data").split(",")
+STATE_FILE = "post_index_state.json"
+# Per-batch progress since the last full state save, one JSON object per line
+STATE_JOURNAL_FILE = "post_index_state.log"
+
+# Only these fields are read from MongoDB; raw_data and other payloads are never pulled
+TEXT_PROJECTIONS = {
+    "engagement_data": {"title": 1, "content": 1, "platform": 1, "product_category": 1, "updated_at": 1},
+    "miniso_qa_data": {"question": 1, "answer": 1, "product_category": 1, "source_url": 1, "updated_at": 1},
+}
+
+
+def post_text(collection_name, doc):
+    if collection_name == "miniso_qa_data":
+        return f"Q: {doc.get('question', '')}\nA: {doc.get('answer', '')}".strip()
+    return " ".join(part for part in (doc.get("title"), doc.get("content")) if part).strip()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def source_key(collection_name):
+    return f"mongo:{collection_name}"
+
+
+def load_state(persist_dir=CHROMA_DIR):
+    path = os.path.join(persist_dir, STATE_FILE)
+    state = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            state = json.load(f)
+    # Replay batches journaled by a run that stopped before saving the full state
+    journal_path = os.path.join(persist_dir, STATE_JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        with open(journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line of an interrupted append
+                    break
+                cstate = state.get(entry["collection"])
+                if cstate is None or cstate.get("index_id") != entry.get("index_id"):
+                    cstate = state[entry["collection"]] = {"index_id": entry.get("index_id"), "last_id": None, "last_run": None, "posts": {}}
+                cstate["last_id"] = entry["last_id"]
+                for post_id, value in entry["posts"].items():
+                    if value is None:
+                        cstate["posts"].pop(post_id, None)
+                    else:
+                        cstate["posts"][post_id] = value
+    return state
+
+
+def save_state(state, persist_dir=CHROMA_DIR):
+    path = os.path.join(persist_dir, STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    # Everything journaled so far is now part of the saved state
+    journal_path = os.path.join(persist_dir, STATE_JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+def journal_batch(collection_name, cstate, changed, persist_dir=CHROMA_DIR):
+    """Append one batch's watermark and post entries, so per-batch progress costs O(batch) to persist."""
+    entry = {
+        "collection": collection_name,
+        "index_id": cstate.get("index_id"),
+        "last_id": cstate["last_id"],
+        "posts": {post_id: cstate["posts"].get(post_id) for post_id in changed},
+    }
+    with open(os.path.join(persist_dir, STATE_JOURNAL_FILE), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+class PostIndexer:
+    """Embeds MongoDB posts into the chatbot's Chroma collection incrementally.
+
+    A per-collection watermark (highest ``_id`` indexed) means each run only reads
+    and embeds documents inserted since the previous run. Every indexed post keeps
+    its content hash and chunk count, so updates re-embed just that post and
+    deletes remove its chunks by id without querying the vector store.
+
+    Progress is journaled per batch so an interrupted run resumes where it
+    stopped, but the manifest (and so ``index_version``, which the chatbot keys
+    its caches on) changes once per collection, at the end of the run.
+
+    In-place edits are only seen through ``updated_at``, which the scrapers and
+    merge step never set (they only insert); run with ``--full-check`` to pick up
+    edits made any other way.
+    """
+
+    def __init__(self, db, mongo_db, persist_dir=CHROMA_DIR, batch_size=EMBED_BATCH_SIZE):
+        self.db = db
+        self.mongo_db = mongo_db
+        self.persist_dir = persist_dir
+        self.batch_size = batch_size
+        self.state = load_state(persist_dir)
+
+    def _collection_state(self, collection_name):
+        index_id = load_manifest(self.persist_dir).get("index_id")
+        cstate = self.state.get(collection_name)
+        # The index was rebuilt (settings change) since this state was recorded: start over
+        if cstate is None or cstate.get("index_id") != index_id:
+            cstate = self.state[collection_name] = {"index_id": index_id, "last_id": None, "last_run": None, "posts": {}}
+        return cstate
+
+    def _chunk_ids(self, collection_name, post_id, count):
+        return [f"{collection_name}-{post_id}-{i}" for i in range(count)]
+
+    def _remove_post(self, collection_name, post_id, posts):
+        entry = posts.pop(post_id, None)
+        if entry:
+            self.db.delete(ids=self._chunk_ids(collection_name, post_id, entry[1]))
+
+    def _embed_batch(self, collection_name, docs, posts):
+        """Embed the new or changed posts of ``docs``; returns the ids of those posts."""
+        chunks, ids, changed = [], [], []
+        for doc in docs:
+            post_id = str(doc["_id"])
+            text = post_text(collection_name, doc)
+            digest = content_hash(text)
+            if posts.get(post_id, [None])[0] == digest:
+                continue
+            self._remove_post(collection_name, post_id, posts)
+            changed.append(post_id)
+            if not text:
+                continue
+            metadata = {
+                "collection": collection_name,
+                "post_id": post_id,
+                "product_category": doc.get("product_category") or "general",
+                "platform": doc.get("platform") or "Website",
+                "source_sha256": digest,
+            }
+            post_chunks = split_documents([Document(page_content=text, metadata=metadata)])
+            chunks.extend(post_chunks)
+            ids.extend(self._chunk_ids(collection_name, post_id, len(post_chunks)))
+            posts[post_id] = [digest, len(post_chunks)]
+        # One embedding call per batch of posts rather than one per post
+        add_chunks(self.db, chunks, ids, source_key(collection_name))
+        return changed
+
+    def _commit(self, collection_name, cstate):
+        # Fingerprint of the indexed posts so index_version (and everything derived from it) changes
+        fingerprint = hashlib.sha256(json.dumps(cstate["posts"], sort_keys=True).encode("utf-8")).hexdigest()
+        chunks = sum(entry[1] for entry in cstate["posts"].values())
+        save_state(self.state, self.persist_dir)
+
+        def record(manifest):
+            manifest["sources"][source_key(collection_name)] = {"sha256": fingerprint, "chunks": chunks, "owner": "post_indexer"}
+        update_manifest(record, self.persist_dir)
+
+    def index_collection(self, collection_name, full_check=False):
+        collection = self.mongo_db[collection_name]
+        projection = TEXT_PROJECTIONS.get(collection_name, {"title": 1, "content": 1})
+        cstate = self._collection_state(collection_name)
+        posts = cstate["posts"]
+        stats = {"new_or_updated": 0, "deleted": 0}
+        before = dict(posts)
+
+        # Inserts since the watermark, in _id order so an interrupted run resumes where it stopped
+        query = {"_id": {"$gt": ObjectId(cstate["last_id"])}} if cstate["last_id"] else {}
+        # Updates: either documents that carry updated_at, or a full content-hash sweep
+        if full_check:
+            query = {}
+        elif cstate["last_run"]:
+            updated = {"updated_at": {"$gt": datetime.fromisoformat(cstate["last_run"])}}
+            query = {"$or": [query, updated]} if query else updated
+        run_started = datetime.now(timezone.utc).isoformat()
+
+        batch = []
+        for doc in collection.find(query, projection).sort("_id", 1).batch_size(self.batch_size):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                self._flush(collection_name, cstate, batch)
+                batch = []
+        self._flush(collection_name, cstate, batch)
+
+        # Deletes: only _ids are read, never document bodies
+        live_ids = {str(doc["_id"]) for doc in collection.find({}, {"_id": 1})}
+        for post_id in [post_id for post_id in posts if post_id not in live_ids]:
+            self._remove_post(collection_name, post_id, posts)
+            stats["deleted"] += 1
+
+        stats["new_or_updated"] = sum(1 for post_id, entry in posts.items() if before.get(post_id) != entry)
+        cstate["last_run"] = run_started
+        self._commit(collection_name, cstate)
+        return stats
+
+    def _flush(self, collection_name, cstate, batch):
+        if not batch:
+            return
+        changed = self._embed_batch(collection_name, batch, cstate["posts"])
+        last_id = str(batch[-1]["_id"])
+        if cstate["last_id"] is None or ObjectId(last_id) > ObjectId(cstate["last_id"]):
+            cstate["last_id"] = last_id
+        # Only this batch is persisted; the full state and the manifest are written once, in _commit
+        journal_batch(collection_name, cstate, changed, self.persist_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally index MongoDB posts into the chatbot's vector store.")
+    parser.add_argument("--collections", nargs="+", default=POST_COLLECTIONS)
+    parser.add_argument("--full-check", action="store_true", help="Re-hash every post to pick up in-place edits (required unless writers set updated_at)")
+    args = parser.parse_args()
+
+    mongo_client = pymongo.MongoClient(MONGODB_URI)
+    try:
+        embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+        # Same settings check as the chatbot, so posts never land in a collection it is about to wipe
+        db, _ = open_checked_index(embeddings, EMBEDDING_MODEL)
+        indexer = PostIndexer(db, mongo_client[DATABASE_NAME])
+        for collection_name in args.collections:
+            stats = indexer.index_collection(collection_name, full_check=args.full_check)
+            print(f"{collection_name}: {stats['new_or_updated']} new/updated, {stats['deleted']} deleted")
+    finally:
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from index_store import CHROMA_DIR, current_index_version, open_collection, file_lock
+
+QUANTIZED_DIR = os.getenv("QUANTIZED_DIR", os.path.join(CHROMA_DIR, "quantized"))
+QUANTIZED_MODE = os.getenv("QUANTIZED_MODE", "int8")
+QUANTIZED_OVERSAMPLE = int(os.getenv("QUANTIZED_OVERSAMPLE", 10))
+# Rows scored per block; keeps the float32 scratch matrix to a few MB whatever the corpus size
+SCAN_ROWS = 4096
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors):
+    """Symmetric per-vector int8 quantization; returns codes and their float32 scales."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def quantize_binary(vectors):
+    """One sign bit per dimension, packed 8 dimensions per byte."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def version_dir(index_dir, index_version):
+    return os.path.join(index_dir, str(index_version))
+
+
+def _write_arrays(collection, build_dir, index_version, page_size):
+    all_ids = collection.get(include=[])["ids"]
+    total = len(all_ids)
+    ids = np.empty(total, dtype=f"S{max((len(doc_id.encode('utf-8')) for doc_id in all_ids), default=1)}")
+    del all_ids
+    first = collection.get(include=["embeddings"], limit=1)
+    dim = len(first["embeddings"][0]) if total else 0
+
+    full = np.lib.format.open_memmap(os.path.join(build_dir, "vectors_f32.npy"), mode="w+", dtype=np.float32, shape=(total, dim))
+    int8 = np.lib.format.open_memmap(os.path.join(build_dir, "vectors_i8.npy"), mode="w+", dtype=np.int8, shape=(total, dim))
+    scales = np.lib.format.open_memmap(os.path.join(build_dir, "scales.npy"), mode="w+", dtype=np.float32, shape=(total,))
+    binary = np.lib.format.open_memmap(os.path.join(build_dir, "vectors_bin.npy"), mode="w+", dtype=np.uint8, shape=(total, (dim + 7) // 8))
+    # Texts and metadata as concatenated UTF-8 records plus row offsets, read back a record at a time
+    text_offsets = np.zeros(total + 1, dtype=np.int64)
+    metadata_offsets = np.zeros(total + 1, dtype=np.int64)
+
+    with open(os.path.join(build_dir, "texts.bin"), "wb") as texts, open(os.path.join(build_dir, "metadatas.bin"), "wb") as metadatas:
+        for offset in range(0, total, page_size):
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            vectors = _normalize(np.asarray(page["embeddings"], dtype=np.float32))
+            rows = slice(offset, offset + len(vectors))
+            full[rows] = vectors
+            int8[rows], scales[rows] = quantize_int8(vectors)
+            binary[rows] = quantize_binary(vectors)
+            ids[rows] = [doc_id.encode("utf-8") for doc_id in page["ids"]]
+            for row, (text, metadata) in enumerate(zip(page["documents"], page["metadatas"]), start=offset):
+                text_offsets[row + 1] = text_offsets[row] + texts.write((text or "").encode("utf-8"))
+                metadata_offsets[row + 1] = metadata_offsets[row] + metadatas.write(json.dumps(metadata or {}).encode("utf-8"))
+    for array in (full, int8, scales, binary):
+        array.flush()
+    # Fixed-width bytes, memory-mapped at search time instead of loaded as Python strings;
+    # the sorted copy answers id lookups by binary search without an in-memory dict
+    np.save(os.path.join(build_dir, "ids.npy"), ids)
+    order = np.argsort(ids, kind="stable")
+    np.save(os.path.join(build_dir, "ids_sorted.npy"), ids[order])
+    np.save(os.path.join(build_dir, "id_rows.npy"), order.astype(np.int32))
+    np.save(os.path.join(build_dir, "text_offsets.npy"), text_offsets)
+    np.save(os.path.join(build_dir, "metadata_offsets.npy"), metadata_offsets)
+
+    with open(os.path.join(build_dir, "meta.json"), "w") as f:
+        json.dump({"index_version": index_version, "count": total, "dim": dim}, f)
+
+
+def build_quantized_index(collection, index_dir=QUANTIZED_DIR, index_version=None, page_size=5000):
+    """Export the Chroma vectors into memory-mapped float32, int8 and binary files, with the chunk texts and metadata.
+
+    Each index version gets its own directory, written under a temporary name and
+    renamed into place, so files that searches still have mapped are never rewritten.
+    Returns that directory.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    target = version_dir(index_dir, index_version)
+    # One builder per index directory across uvicorn workers; the others wait and reuse its output
+    with file_lock(os.path.join(index_dir, ".build.lock")):
+        # texts.bin marks the current layout; older exports are rebuilt
+        if not os.path.exists(os.path.join(target, "texts.bin")):
+            shutil.rmtree(target, ignore_errors=True)
+            build_dir = tempfile.mkdtemp(prefix=".build-", dir=index_dir)
+            try:
+                _write_arrays(collection, build_dir, index_version, page_size)
+                os.rename(build_dir, target)
+            except BaseException:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                raise
+        # Older versions can go: on POSIX, unlinked files stay readable through existing mappings
+        for name in os.listdir(index_dir):
+            path = os.path.join(index_dir, name)
+            if name != str(index_version) and not name.startswith(".") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+    return target
+
+
+class Snapshot:
+    """The files of one index version, swapped in as a unit.
+
+    The codes that every search scans are memory-mapped. Float32 rows, texts and
+    metadata are only needed for a few candidates per query and are read with
+    ``os.pread``: mapping them would leave most of each file resident, since every
+    page fault also maps the neighbouring cached pages.
+
+    The texts and metadata mean a quantized chatbot never reads the Chroma
+    collection: any read makes Chroma load its whole HNSW index, which is the memory
+    this export exists to save.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.path = path
+        self.index_version = meta["index_version"]
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.ids_sorted = np.load(os.path.join(path, "ids_sorted.npy"), mmap_mode="r")
+        self.id_rows = np.load(os.path.join(path, "id_rows.npy"), mmap_mode="r")
+        self.int8 = np.load(os.path.join(path, "vectors_i8.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        self.binary = np.load(os.path.join(path, "vectors_bin.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        self.metadata_offsets = np.load(os.path.join(path, "metadata_offsets.npy"), mmap_mode="r")
+        # Offset of the first row, past the .npy header
+        self.vectors_offset = np.load(os.path.join(path, "vectors_f32.npy"), mmap_mode="r").offset
+        self.vectors = open(os.path.join(path, "vectors_f32.npy"), "rb")
+        self.texts = open(os.path.join(path, "texts.bin"), "rb")
+        self.metadatas = open(os.path.join(path, "metadatas.bin"), "rb")
+
+    def full_rows(self, rows):
+        """Float32 vectors of ``rows``, read from disk."""
+        row_bytes = self.dim * 4
+        data = b"".join(os.pread(self.vectors.fileno(), row_bytes, self.vectors_offset + int(row) * row_bytes) for row in rows)
+        return np.frombuffer(data, dtype=np.float32).reshape(len(rows), self.dim)
+
+    def _record(self, f, offsets, row):
+        start = int(offsets[row])
+        return os.pread(f.fileno(), int(offsets[row + 1]) - start, start)
+
+    def chunks(self):
+        """Yield ``(id, text)`` for every chunk, read sequentially."""
+        with open(os.path.join(self.path, "texts.bin"), "rb") as f:
+            for row in range(self.count):
+                yield self.ids[row].decode("utf-8"), f.read(int(self.text_offsets[row + 1] - self.text_offsets[row])).decode("utf-8")
+
+    def row(self, doc_id):
+        key = doc_id.encode("utf-8")
+        if len(key) > self.ids_sorted.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(self.ids_sorted, key))
+        if position < self.count and self.ids_sorted[position] == key:
+            return int(self.id_rows[position])
+        return None
+
+    def fetch(self, doc_ids):
+        """``(id, text, metadata)`` for the ``doc_ids`` in this export, in order."""
+        found = []
+        for doc_id in doc_ids:
+            row = self.row(doc_id)
+            if row is None:
+                continue
+            text = self._record(self.texts, self.text_offsets, row).decode("utf-8")
+            metadata = json.loads(self._record(self.metadatas, self.metadata_offsets, row))
+            found.append((doc_id, text, metadata))
+        return found
+
+
+class QuantizedIndex:
+    """Compact search over memory-mapped quantized vectors with exact re-scoring.
+
+    Candidates come from a scan of the binary codes (Hamming distance) or the int8
+    codes (scaled dot product); only the top ``oversample * k`` rows of the
+    full-precision float32 file are then read from disk and re-scored exactly.
+    Resident memory is dominated by the 1-bit (or 1-byte) codes instead of four
+    bytes per dimension.
+
+    Exports are built by ``python quantized_index.py`` in a child process, so the
+    serving process never loads Chroma's HNSW index to read the vectors.
+    """
+
+    def __init__(self, index_dir=QUANTIZED_DIR, mode=QUANTIZED_MODE, oversample=QUANTIZED_OVERSAMPLE):
+        self.index_dir = index_dir
+        self.mode = mode
+        self.oversample = oversample
+
+    def load(self, index_version):
+        """The snapshot of ``index_version``, exporting it first if needed; blocks until it is ready."""
+        target = version_dir(self.index_dir, index_version)
+        if not os.path.exists(os.path.join(target, "texts.bin")):
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--index-dir", self.index_dir, "--index-version", str(index_version)],
+                check=True,
+            )
+        return Snapshot(target)
+
+    def _candidate_scores(self, snapshot, query_codes, query_scale, start, stop):
+        if self.mode == "int8":
+            # int8 dot products are exact in float32 (|sum| <= dim * 127^2 < 2^24) and run through BLAS
+            dots = snapshot.int8[start:stop].astype(np.float32) @ query_codes
+            return dots * snapshot.scales[start:stop] * query_scale
+        # Fewer differing bits means more similar; negate so larger is better for both modes
+        bits = np.bitwise_xor(snapshot.binary[start:stop], query_codes)
+        return -POPCOUNT[bits].sum(axis=1, dtype=np.int32)
+
+    def search(self, snapshot, embedding, k=20):
+        if not snapshot.count:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        if self.mode == "int8":
+            codes, scales = quantize_int8(query[None, :])
+            query_codes, query_scale = codes[0].astype(np.float32), scales[0]
+        else:
+            query_codes, query_scale = quantize_binary(query[None, :])[0], None
+        n_candidates = min(snapshot.count, k * self.oversample)
+
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for start in range(0, snapshot.count, SCAN_ROWS):
+            stop = min(start + SCAN_ROWS, snapshot.count)
+            scores = self._candidate_scores(snapshot, query_codes, query_scale, start, stop).astype(np.float32)
+            best_rows = np.concatenate([best_rows, np.arange(start, stop)])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_rows) > n_candidates:
+                keep = np.argpartition(-best_scores, n_candidates - 1)[:n_candidates]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        # Exact re-score: only these rows of the float32 file are read
+        candidates = np.sort(best_rows)
+        exact = snapshot.full_rows(candidates) @ query
+        order = np.argsort(-exact)[:k]
+        return [snapshot.ids[i].decode("utf-8") for i in candidates[order]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the quantized, memory-mapped copy of the chatbot's vector index.")
+    parser.add_argument("--index-dir", default=QUANTIZED_DIR)
+    parser.add_argument("--index-version", help="Version label of the export (default: the current manifest's)")
+    args = parser.parse_args()
+    build_quantized_index(open_collection(), args.index_dir, args.index_version or current_index_version())
+    print(f"Quantized index written to {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
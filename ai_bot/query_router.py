@@ -0,0 +1,72 @@
+import numpy as np
+
+# Example questions per route; their embedding centroids are what queries are compared against
+ROUTE_EXAMPLES = {
+    "engagement": [
+        "How can we improve customer engagement on social media?",
+        "Which posts got the most interactions this month?",
+        "What engagement trends do you see in our electronics category?",
+        "What are Miniso's most popular products?",
+        "What do customers say about Miniso earbuds?",
+        "Tell me about the Miniso brand and its history.",
+        "How does Miniso price its products?",
+        "Where can I find a Miniso store near me?",
+        "What skincare and cosmetics does Miniso sell?",
+        "Which communities talk about Miniso plushies and toys?",
+    ],
+    "general": [
+        "hi",
+        "Hello, how are you?",
+        "Thanks, that was helpful!",
+        "Tell me a joke.",
+        "What is the capital of France?",
+        "Explain how neural networks work.",
+        "Write a short poem about the sea.",
+        "What's the weather like today?",
+        "Can you help me plan a weekend trip?",
+        "What is the meaning of life?",
+    ],
+}
+RETRIEVAL_ROUTES = ("engagement",)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class QueryRouter:
+    """Routes a query by cosine similarity between its embedding and per-route centroids.
+
+    The caller embeds the query once and passes the same vector to ``route`` and to
+    the vector search, so routing adds no extra embedding call per request.
+    ``retrieval_margin`` biases ties toward retrieval, which is the safer mistake.
+    """
+
+    def __init__(self, embeddings, examples=ROUTE_EXAMPLES, retrieval_routes=RETRIEVAL_ROUTES, retrieval_margin=0.02):
+        self.routes = list(examples)
+        self.retrieval_routes = set(retrieval_routes)
+        self.retrieval_margin = retrieval_margin
+        texts = [text for route in self.routes for text in examples[route]]
+        vectors = _normalize_rows(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+        centroids, offset = [], 0
+        for route in self.routes:
+            count = len(examples[route])
+            centroids.append(vectors[offset:offset + count].mean(axis=0))
+            offset += count
+        self.centroids = _normalize_rows(np.vstack(centroids))
+
+    def scores(self, embedding):
+        vector = _normalize_rows(np.asarray(embedding, dtype=np.float32))
+        return dict(zip(self.routes, (self.centroids @ vector).tolist()))
+
+    def route(self, embedding):
+        scores = self.scores(embedding)
+        for route in self.routes:
+            if route in self.retrieval_routes:
+                scores[route] += self.retrieval_margin
+        return max(scores, key=scores.get)
+
+    def needs_retrieval(self, embedding):
+        return self.route(embedding) in self.retrieval_routes
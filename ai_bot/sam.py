@@ -1,3 +1,4 @@
+import os
 import pymongo
 import requests
 
@@ -6,7 +7,9 @@ MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "company_data")
 SLACK_WORKSPACE_URL = os.getenv("SLACK_WORKSPACE_URL")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
+COLLECTION_NAME = os.getenv("TOP_POSTS_COLLECTION", "top_engagement_posts")
 CHATBOT_API_URL = "http://localhost:7000/chatbot_response"
+CHATBOT_BATCH_API_URL = f"{CHATBOT_API_URL}/batch"
 
 def get_questions():
     
@@ -26,14 +29,14 @@ def get_questions():
     client.close()
     return questions
 
-def get_chatbot_response(question):
+def get_chatbot_responses(questions):
     
-    data = {"question": question}
-    response = requests.post(CHATBOT_API_URL, json=data)
+    data = {"questions": questions}
+    response = requests.post(CHATBOT_BATCH_API_URL, json=data)
     if response.status_code == 200:
-        return response.json().get("answer")
+        return [item.get("answer") or f"Error: {item.get('error')}" for item in response.json().get("results", [])]
     else:
-        return "Error: Unable to retrieve chatbot response."
+        return ["Error: Unable to retrieve chatbot response."] * len(questions)
 
 def send_to_slack(message):
     
@@ -48,8 +51,8 @@ def process_and_send_responses():
         print("No questions found.")
         return
 
-    for idx, question in enumerate(questions, start=1):
-        answer = get_chatbot_response(question)
+    answers = get_chatbot_responses(questions)
+    for idx, (question, answer) in enumerate(zip(questions, answers), start=1):
         qa_message = (
             f"*Q{idx}:* {question}\n"
             f"*A{idx}:* {answer}\n"
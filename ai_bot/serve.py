@@ -0,0 +1,86 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import uvicorn
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Production serving configuration
+HOST = os.getenv("CHATBOT_HOST", "0.0.0.0")
+PORT = int(os.getenv("CHATBOT_PORT", 7000))
+WORKERS = int(os.getenv("CHATBOT_WORKERS", 1))
+# Every queued generation parks a thread, so the pool must cover the admission queue plus probes and cache hits
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", int(os.getenv("MAX_INFLIGHT", 2)) + int(os.getenv("MAX_QUEUE", 32)) + 8))
+
+
+class ThreadPoolWsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs every request on its own pool thread.
+
+    asgiref's adapter runs WSGI apps thread-sensitively, i.e. all requests on one
+    shared thread, so a long generation would block every probe and scrape.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiInstance(self.wsgi_application, self.executor, self.duplicate_header_limit)(scope, receive, send)
+
+
+class ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor, duplicate_header_limit=100):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self.run_wsgi_app_sync, thread_sensitive=False, executor=self.executor)(body)
+
+    def run_wsgi_app_sync(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"text/plain")]})
+            self.sync_send({"type": "http.response.body", "body": b"Bad Request"})
+            return
+        output = self.wsgi_application(environ, self.start_response)
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            self.sync_send({"type": "http.response.body"})
+        finally:
+            # WSGI requires close(); Flask releases admission slots and request contexts there
+            if hasattr(output, "close"):
+                output.close()
+
+
+def create_application():
+    # Imported here so each uvicorn worker loads the models itself, not the supervisor
+    from bot import app, start_warm_up
+    # Models load in the background; /readyz reports 503 until they are ready
+    start_warm_up()
+    # Admission control (MAX_INFLIGHT / MAX_QUEUE, 429 + Retry-After) lives in bot.py, per generation
+    return ThreadPoolWsgi(app, ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AI-Grow chatbot API under uvicorn with admission control.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+    uvicorn.run("serve:create_application", factory=True, host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
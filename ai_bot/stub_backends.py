@@ -0,0 +1,74 @@
+import os
+import time
+import hashlib
+import numpy as np
+
+# Latency model for benchmarking without Ollama or sentence-transformers
+STUB_EMBEDDING_DIM = int(os.getenv("STUB_EMBEDDING_DIM", 384))
+STUB_EMBED_LATENCY_MS = float(os.getenv("STUB_EMBED_LATENCY_MS", 5))
+STUB_LLM_FIRST_TOKEN_MS = float(os.getenv("STUB_LLM_FIRST_TOKEN_MS", 200))
+STUB_LLM_TOKENS_PER_SECOND = float(os.getenv("STUB_LLM_TOKENS_PER_SECOND", 20))
+STUB_LLM_OUTPUT_TOKENS = int(os.getenv("STUB_LLM_OUTPUT_TOKENS", 60))
+
+WORDS = (
+    "miniso", "customers", "love", "our", "new", "collection", "of", "cute", "and", "affordable",
+    "products", "engagement", "is", "growing", "across", "platforms", "try", "the", "latest", "plush",
+)
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class StubEmbeddings:
+    """Deterministic hash-seeded unit vectors with a fixed per-call latency.
+
+    Identical texts always map to the same vector, so cache and routing behaviour
+    is reproducible run to run; the vectors carry no meaning beyond that.
+    """
+
+    model_name = "stub"
+
+    def __init__(self, dim=STUB_EMBEDDING_DIM, latency_ms=STUB_EMBED_LATENCY_MS):
+        self.dim = dim
+        self.latency_ms = latency_ms
+
+    def _vector(self, text):
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_ms / 1000)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class StubLLM:
+    """Stands in for the Ollama LLM: fixed time to first token, then a steady token rate.
+
+    Supports the two calls bot.py makes, ``invoke`` and ``stream``. The output
+    text is derived from the prompt so the same prompt always yields the same answer.
+    """
+
+    def __init__(self, first_token_ms=STUB_LLM_FIRST_TOKEN_MS, tokens_per_second=STUB_LLM_TOKENS_PER_SECOND, output_tokens=STUB_LLM_OUTPUT_TOKENS):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+
+    def _tokens(self, prompt, num_predict=None):
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        rng = np.random.default_rng(_seed(text))
+        count = min(self.output_tokens, num_predict or self.output_tokens)
+        return [WORDS[i] + " " for i in rng.integers(0, len(WORDS), count)]
+
+    def stream(self, prompt, num_predict=None, **kwargs):
+        time.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self._tokens(prompt, num_predict)):
+            if i and self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield token
+
+    def invoke(self, prompt, num_predict=None, **kwargs):
+        return "".join(self.stream(prompt, num_predict))
@@ -0,0 +1,40 @@
+import hashlib
+import requests
+
+# Fields of ai_answer that must match the live chatbot for a stored answer to be reused
+VERSION_FIELDS = ("model", "prompt_version")
+
+
+def post_question(doc):
+    return doc.get("cleaned_content") or doc.get("title") or doc.get("content")
+
+
+def question_hash(question):
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+
+def is_stale(doc, info, sources):
+    """Whether the precomputed ``ai_answer`` of a top post needs regenerating.
+
+    Besides the question, model and prompt, the answer is keyed on ``sources``: the
+    chunks retrieval returns for the question now (``/chatbot_sources/batch``). Index
+    updates that touch other documents or posts leave it alone.
+    """
+    answer = doc.get("ai_answer")
+    if not answer or answer.get("question_hash") != question_hash(post_question(doc)):
+        return True
+    if any(answer.get(field) != info.get(field) for field in VERSION_FIELDS):
+        return True
+    return answer.get("sources") != sources
+
+
+def request_sources(url, questions, batch_size=50, timeout=120):
+    """Current retrieval sources per question, fetched in batches; returns (sources, chatbot_info)."""
+    sources, info = [], {}
+    for start in range(0, len(questions), batch_size):
+        response = requests.post(url, json={"questions": questions[start:start + batch_size]}, timeout=timeout)
+        response.raise_for_status()
+        payload = response.json()
+        sources.extend(result["sources"] for result in payload["results"])
+        info = payload.get("meta", info)
+    return sources, info
@@ -0,0 +1,53 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+
+N_CLUSTERS = 5
+MAX_FEATURES = 1000
+HASH_FEATURES = 2 ** 12
+KMEANS_BATCH_SIZE = 4096
+RANDOM_STATE = 42
+
+
+def append_sentiment(X, sentiment_scores, weight=1.0):
+    """Add the (already [-1, 1]) VADER compound score as one more sparse column."""
+    sentiment = np.nan_to_num(np.asarray(sentiment_scores, dtype=np.float64)) * weight
+    return sp.hstack([X, sp.csr_matrix(sentiment.reshape(-1, 1))], format="csr")
+
+
+def cluster_posts(texts, sentiment_scores, n_clusters=N_CLUSTERS, max_features=MAX_FEATURES, random_state=RANDOM_STATE):
+    """TF-IDF + sentiment features clustered with mini-batch k-means, without densifying the matrix."""
+    X = TfidfVectorizer(max_features=max_features).fit_transform(texts)
+    X = append_sentiment(X, sentiment_scores)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=KMEANS_BATCH_SIZE, random_state=random_state, n_init="auto")
+    return kmeans.fit_predict(X)
+
+
+class StreamingClusterer:
+    """Mini-batch k-means fitted chunk by chunk, for corpora that do not fit in memory.
+
+    Texts are hashed into a fixed feature space, so no vocabulary has to be built
+    over the whole corpus first; IDF weights are learnt from the first chunk. Call
+    ``partial_fit`` over every chunk, then ``predict`` in a second pass. Memory is
+    bounded by the chunk size, not the corpus size.
+    """
+
+    def __init__(self, n_clusters=N_CLUSTERS, n_features=HASH_FEATURES, sentiment_weight=1.0, random_state=RANDOM_STATE):
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self.tfidf = None
+        self.sentiment_weight = sentiment_weight
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=KMEANS_BATCH_SIZE, random_state=random_state, n_init="auto")
+
+    def features(self, texts, sentiment_scores):
+        counts = self.vectorizer.transform(texts)
+        if self.tfidf is None:
+            self.tfidf = TfidfTransformer().fit(counts)
+        return append_sentiment(self.tfidf.transform(counts), sentiment_scores, self.sentiment_weight)
+
+    def partial_fit(self, texts, sentiment_scores):
+        self.kmeans.partial_fit(self.features(texts, sentiment_scores))
+        return self
+
+    def predict(self, texts, sentiment_scores):
+        return self.kmeans.predict(self.features(texts, sentiment_scores))
@@ -0,0 +1,93 @@
+import pandas as pd
+from analytics.scoring import METRIC_COLUMNS, flatten_metrics
+from analytics.sentiment_cache import SENTIMENT_FIELDS
+from analytics.timestamps import CANONICAL_FIELD, ensure_canonical
+
+ENGAGEMENT_FIELDS = [f"engagement_metrics.{metric}" for metric in METRIC_COLUMNS]
+
+# Fields each dashboard section reads; raw_data, platform_specific and content are never fetched
+SECTION_FIELDS = {
+    "engagement": ["platform"] + ENGAGEMENT_FIELDS,
+    "sentiment": ["cleaned_content"] + SENTIMENT_FIELDS,
+    "clustering": ["cleaned_content", "sentiment_score"],
+    "ranking": ["product_category", "platform"] + ENGAGEMENT_FIELDS,
+    "trends": ["cleaned_content", "timestamp", CANONICAL_FIELD],
+    "prediction": ["timestamp", CANONICAL_FIELD, "product_category"],
+}
+
+# Documents a section can use at all; a document is loaded if any requested section wants it
+SECTION_FILTERS = {
+    "engagement": {"engagement_metrics": {"$type": "object"}},
+    "sentiment": {"cleaned_content": {"$type": "string"}},
+    "clustering": {"cleaned_content": {"$type": "string"}},
+    "ranking": {"product_category": {"$exists": True}},
+    "trends": {"timestamp": {"$ne": None}},
+    "prediction": {"timestamp": {"$ne": None}},
+}
+
+# Low-cardinality labels become categoricals; everything not listed stays object
+COLUMN_TYPES = {
+    "platform": "category",
+    "product_category": "category",
+    "cleaned_content": "string",
+    "sentiment_score": "float64",
+}
+
+BATCH_SIZE = 5000
+
+
+def fields_for(sections):
+    return sorted({field for section in sections for field in SECTION_FIELDS[section]})
+
+
+def filter_for(sections):
+    filters = [SECTION_FILTERS[section] for section in sections if section in SECTION_FILTERS]
+    if not filters or len(filters) < len(sections):
+        return {}
+    unique = [f for i, f in enumerate(filters) if f not in filters[:i]]
+    return unique[0] if len(unique) == 1 else {"$or": unique}
+
+
+def _typed_frame(rows, fields):
+    # Dotted projections come back as nested dicts under their top-level key
+    columns = list(dict.fromkeys(["_id"] + [field.split(".")[0] for field in fields]))
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    if "engagement_metrics" in frame.columns:
+        frame = flatten_metrics(frame)
+    if "timestamp" in frame.columns:
+        # Rows migrated or ingested since carry timestamp_utc; only legacy rows are parsed, in bulk
+        frame = ensure_canonical(frame).drop(columns=["timestamp"])
+    for column, dtype in COLUMN_TYPES.items():
+        if column in frame.columns:
+            # Categories are unified after concatenation; keep per-batch frames as plain strings
+            frame[column] = frame[column].astype("string" if dtype == "category" else dtype)
+    return frame
+
+
+def load_sections(collection, sections, query=None, batch_size=BATCH_SIZE):
+    """Load only the fields (and documents) the given dashboard sections need.
+
+    The cursor is consumed ``batch_size`` documents at a time and each batch is
+    converted to typed columns straight away, so the untyped dicts of the whole
+    collection are never held in memory together.
+    """
+    fields = fields_for(sections)
+    mongo_filter = filter_for(sections)
+    if query:
+        mongo_filter = {"$and": [mongo_filter, query]} if mongo_filter else query
+    projection = {field: 1 for field in fields}
+
+    frames, rows = [], []
+    for doc in collection.find(mongo_filter, projection).batch_size(batch_size):
+        rows.append(doc)
+        if len(rows) >= batch_size:
+            frames.append(_typed_frame(rows, fields))
+            rows = []
+    if rows or not frames:
+        frames.append(_typed_frame(rows, fields))
+
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    for column, dtype in COLUMN_TYPES.items():
+        if dtype == "category" and column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ("upvotes", "comments", "shares")
+DEFAULT_WEIGHTS = {"upvotes": 0.4, "comments": 0.4, "shares": 0.2}
+# "max": divide by the corpus-wide max (original behaviour); "platform_max": by the max within the
+# post's platform, so Reddit upvotes and Quora views are not compared on one scale;
+# "percentile": rank within the corpus, robust to a single viral post
+NORMALIZATIONS = ("max", "platform_max", "percentile")
+ENGAGEMENT_NORMALIZATION = os.getenv("ENGAGEMENT_NORMALIZATION", "max")
+
+
+def flatten_metrics(df, column="engagement_metrics"):
+    """Replace the nested ``engagement_metrics`` dicts with one float column per metric."""
+    if column not in df.columns:
+        for metric in METRIC_COLUMNS:
+            if metric not in df.columns:
+                df[metric] = 0.0
+        return df
+    metrics = pd.DataFrame.from_records(
+        [value if isinstance(value, dict) else {} for value in df[column]],
+        columns=list(METRIC_COLUMNS),
+        index=df.index,
+    )
+    for metric in METRIC_COLUMNS:
+        df[metric] = pd.to_numeric(metrics[metric], errors="coerce").fillna(0.0).astype("float64")
+    return df.drop(columns=[column])
+
+
+def _denominators(df, values, normalization):
+    if normalization == "max":
+        return values.max(axis=0, keepdims=True)
+    if normalization == "platform_max":
+        # Posts without a platform form their own bucket instead of getting NaN (unnormalized) denominators
+        return df.groupby("platform", observed=True, dropna=False)[list(METRIC_COLUMNS)].transform("max").to_numpy(dtype=np.float64)
+    raise ValueError(f"Unknown normalization '{normalization}', expected one of {NORMALIZATIONS}")
+
+
+def engagement_scores(df, weights=DEFAULT_WEIGHTS, normalization=ENGAGEMENT_NORMALIZATION):
+    """Weighted sum of normalized metrics over the flattened metric columns."""
+    if df.empty:
+        return np.zeros(0)
+    values = df[list(METRIC_COLUMNS)].to_numpy(dtype=np.float64)
+    if normalization == "percentile":
+        normalized = np.where(values > 0, df[list(METRIC_COLUMNS)].rank(pct=True, method="max").to_numpy(), 0.0)
+    else:
+        denominators = _denominators(df, values, normalization)
+        normalized = values / np.where(denominators > 0, denominators, 1.0)
+    return normalized @ np.array([weights.get(metric, 0.0) for metric in METRIC_COLUMNS])
+
+
+def score_engagement(df, weights=DEFAULT_WEIGHTS, normalization=ENGAGEMENT_NORMALIZATION):
+    if "engagement_metrics" in df.columns:
+        df = flatten_metrics(df)
+    df["engagement_score"] = engagement_scores(df, weights, normalization)
+    return df
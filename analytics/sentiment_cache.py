@@ -0,0 +1,106 @@
+import os
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+import pymongo
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Bump the suffix when labelling thresholds or text preprocessing change; the nltk version
+# is included because VADER's lexicon ships with it
+SENTIMENT_ANALYZER = "vader"
+SENTIMENT_REVISION = 1
+SENTIMENT_FIELDS = ["sentiment", "sentiment_score", "sentiment_hash", "sentiment_version"]
+POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD = 0.05, -0.05
+SCORE_BATCH_SIZE = 2000
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", os.cpu_count() or 1))
+WRITE_BATCH_SIZE = 1000
+
+_analyzer = None
+
+
+def analyzer_version():
+    import nltk
+    return f"{SENTIMENT_ANALYZER}:{nltk.__version__}:{SENTIMENT_REVISION}"
+
+
+def content_hashes(texts):
+    return [hashlib.sha1(text.encode("utf-8")).hexdigest()[:16] if isinstance(text, str) else None for text in texts]
+
+
+def _score_batch(texts):
+    # One analyzer per worker process; constructing it loads the lexicon
+    global _analyzer
+    if _analyzer is None:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return [_analyzer.polarity_scores(text)["compound"] for text in texts]
+
+
+def score_texts(texts, workers=SENTIMENT_WORKERS, batch_size=SCORE_BATCH_SIZE):
+    """VADER compound scores; large inputs are split into batches scored in a process pool."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(batches) <= 1 or workers <= 1:
+        return [score for batch in batches for score in _score_batch(batch)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+        return [score for scores in pool.map(_score_batch, batches) for score in scores]
+
+
+def sentiment_labels(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select([scores > POSITIVE_THRESHOLD, scores < NEGATIVE_THRESHOLD], ["positive", "negative"], "neutral")
+
+
+def apply_sentiment(df, collection=None):
+    """Fill ``sentiment``/``sentiment_score``, re-scoring only rows whose cached result is stale.
+
+    A stored score is reused when its ``sentiment_hash`` matches the hash of the
+    current ``cleaned_content`` and its ``sentiment_version`` matches the running
+    analyzer. Freshly scored rows are written back to ``collection`` when given.
+    Returns the frame and the number of rows that were scored.
+    """
+    for field in SENTIMENT_FIELDS:
+        if field not in df.columns:
+            df[field] = None
+    version = analyzer_version()
+    hashes = pd.Series(content_hashes(df["cleaned_content"].tolist()), index=df.index, dtype="object")
+    has_text = hashes.notna()
+    stale = has_text & (
+        (df["sentiment_hash"] != hashes) | (df["sentiment_version"] != version) | df["sentiment_score"].isna()
+    )
+
+    if stale.any():
+        scores = np.asarray(score_texts(df.loc[stale, "cleaned_content"].tolist()), dtype=np.float64)
+        df["sentiment_score"] = df["sentiment_score"].astype("float64")
+        # Never-scored collections load these as all-NaN float64 columns, which reject strings
+        for field in ("sentiment", "sentiment_hash", "sentiment_version"):
+            df[field] = df[field].astype("object")
+        df.loc[stale, "sentiment_score"] = scores
+        df.loc[stale, "sentiment"] = sentiment_labels(scores)
+        df.loc[stale, "sentiment_hash"] = hashes[stale]
+        df.loc[stale, "sentiment_version"] = version
+        if collection is not None and "_id" in df.columns:
+            write_sentiment(collection, df.loc[stale])
+    # Rows without text have no sentiment, whatever was stored for them before
+    df.loc[~has_text, ["sentiment", "sentiment_score"]] = None
+    return df, int(stale.sum())
+
+
+def write_sentiment(collection, rows):
+    updates = [
+        pymongo.UpdateOne({"_id": row["_id"]}, {"$set": {
+            "sentiment": row["sentiment"],
+            "sentiment_score": float(row["sentiment_score"]),
+            "sentiment_hash": row["sentiment_hash"],
+            "sentiment_version": row["sentiment_version"],
+        }})
+        for row in rows[["_id"] + SENTIMENT_FIELDS].to_dict("records")
+    ]
+    try:
+        for start in range(0, len(updates), WRITE_BATCH_SIZE):
+            collection.bulk_write(updates[start:start + WRITE_BATCH_SIZE], ordered=False)
+    except pymongo.errors.PyMongoError as e:
+        # Scores are still returned; they are just recomputed next time
+        logger.warning(f"Could not persist sentiment scores: {e}")
@@ -0,0 +1,79 @@
+import re
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from dateutil import parser
+from pandas.tseries.api import guess_datetime_format
+
+# Canonical UTC datetime stored next to the platform's raw ``timestamp`` value
+CANONICAL_FIELD = "timestamp_utc"
+DIGITS = re.compile(r"\d")
+
+
+def to_utc_datetime(value):
+    """Convert one raw timestamp (epoch seconds, ISO/free-form string or datetime) to an aware UTC datetime.
+
+    Used at ingest, where values arrive one at a time; returns None when the value cannot be parsed.
+    """
+    try:
+        if isinstance(value, bool) or value is None:
+            return None
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        if isinstance(value, str):
+            value = parser.parse(value)
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
+
+def _parse_strings(strings):
+    """Parse a string Series by grouping values that share a digit/letter shape and one inferred format."""
+    result = pd.Series(pd.NaT, index=strings.index, dtype="datetime64[ns, UTC]")
+    shapes = strings.str.replace(DIGITS, "9", regex=True)
+    for _, group in strings.groupby(shapes, sort=False):
+        fmt = guess_datetime_format(group.iloc[0])
+        if fmt is not None:
+            result.loc[group.index] = pd.to_datetime(group, format=fmt, utc=True, errors="coerce")
+    leftover = result.isna()
+    if leftover.any():
+        # Shapes pandas could not infer a format for fall back to per-value parsing
+        result.loc[leftover] = pd.to_datetime(strings[leftover], format="mixed", utc=True, errors="coerce")
+    return result
+
+
+def normalize_timestamps(values):
+    """Vectorized conversion of a mixed-type timestamp column to tz-naive UTC ``datetime64``.
+
+    Numbers are epoch seconds (Reddit ``created_utc``), strings are grouped by shape
+    and parsed one format at a time, datetimes are converted as is. Unparseable
+    values become NaT.
+    """
+    values = pd.Series(values)
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    kinds = values.map(type)
+
+    numeric = kinds.isin([int, float, np.int64, np.float64])
+    if numeric.any():
+        result.loc[numeric] = pd.to_datetime(values[numeric].astype("float64"), unit="s", utc=True, errors="coerce")
+    strings = kinds == str
+    if strings.any():
+        result.loc[strings] = _parse_strings(values[strings].str.strip())
+    dates = ~(numeric | strings) & values.notna()
+    if dates.any():
+        result.loc[dates] = pd.to_datetime(values[dates].tolist(), utc=True, errors="coerce")
+    return result.dt.tz_localize(None)
+
+
+def ensure_canonical(df, raw="timestamp", canonical=CANONICAL_FIELD):
+    """Fill ``canonical`` from ``raw`` for rows that were stored before the canonical field existed."""
+    if canonical in df.columns:
+        df[canonical] = pd.to_datetime(df[canonical], utc=True, errors="coerce").dt.tz_localize(None)
+    else:
+        df[canonical] = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    missing = df[canonical].isna()
+    if missing.any() and raw in df.columns:
+        df.loc[missing, canonical] = normalize_timestamps(df.loc[missing, raw])
+    return df
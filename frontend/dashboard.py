@@ -1,19 +1,23 @@
+import os
+import sys
 import streamlit as st
 import pymongo
 import pandas as pd
 import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
 from collections import Counter
-from datetime import datetime
-import pytz
 import logging
 from statsmodels.tsa.arima.model import ARIMA
-from dateutil import parser
 import plotly.express as px
 import plotly.graph_objects as go
 
+# Run as `streamlit run frontend/dashboard.py`; make the shared analytics package importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analytics.loader import load_sections
+from analytics.scoring import score_engagement
+from analytics.sentiment_cache import apply_sentiment
+from analytics.clustering import cluster_posts
+from analytics.timestamps import CANONICAL_FIELD
+
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = "company_data"
 TARGET_COLLECTION = "engagement_data"
@@ -45,79 +49,32 @@ def close_mongodb_connection(mongo_client):
     if mongo_client:
         mongo_client.close()
 @st.cache_data(ttl=3600)
-def load_data():
-    collection, mongo_client = get_mongodb_collection()
+def load_data(sections):
+    # The client is cached by st.cache_resource, so it stays open across reruns
+    collection, _ = get_mongodb_collection()
     try:
-        docs = list(collection.find())
-        df = pd.DataFrame(docs)
-        return df
+        return load_sections(collection, sections)
     except Exception as e:
         st.error(f"Error loading data from MongoDB: {e}")
         return pd.DataFrame()
-    finally:
-        close_mongodb_connection(mongo_client)
 #data preprocessing
-def parse_timestamp(timestamp):
-    if isinstance(timestamp, (float, int)):  # Handles both float and int timestamps
-        try:
-            return datetime.fromtimestamp(timestamp, tz=pytz.UTC).replace(tzinfo=None)
-        except OSError:
-            raise ValueError(f"Invalid UNIX timestamp: {timestamp}")
-    elif isinstance(timestamp, str):
-        try:
-            dt = parser.parse(timestamp)
-            return dt.replace(tzinfo=None) if dt.tzinfo else dt
-        except ValueError as e:
-            raise ValueError(f"Unsupported timestamp format: {timestamp}, error: {e}")
-    elif isinstance(timestamp, datetime):
-        return timestamp.replace(tzinfo=None) if timestamp.tzinfo else timestamp
-    else:
-        raise ValueError(f"Unsupported timestamp format: {timestamp}, type: {type(timestamp)}")
-
 def calculate_engagement_score(df):
     if df.empty:
         st.warning("No data available to calculate engagement scores.")
         return df
-
-    upvotes = [doc["engagement_metrics"].get("upvotes", 0) for i, doc in df.iterrows()]
-    comments = [doc["engagement_metrics"].get("comments", 0) for i, doc in df.iterrows()]
-    shares = [doc["engagement_metrics"].get("shares", 0) for i, doc in df.iterrows()]
-
-    max_upvotes = max(upvotes) or 1
-    max_comments = max(comments) or 1
-    max_shares = max(shares) or 1
-
-    engagement_scores = []
-    for i, doc in df.iterrows():
-        u = doc["engagement_metrics"].get("upvotes", 0) / max_upvotes
-        c = doc["engagement_metrics"].get("comments", 0) / max_comments
-        s = doc["engagement_metrics"].get("shares", 0) / max_shares
-        score = (0.4 * u) + (0.4 * c) + (0.2 * s)
-        engagement_scores.append(score)
-
-    df["engagement_score"] = engagement_scores
-    return df
+    return score_engagement(df)
 
 def perform_sentiment_analysis(df):
     if df.empty:
         st.warning("No data available for sentiment analysis.")
         return df
 
-    sia = SentimentIntensityAnalyzer()
-    sentiments = []
-    sentiment_scores = []
-    for i, doc in df.iterrows():
-        if 'cleaned_content' in doc and isinstance(doc['cleaned_content'], str): #Added check to make sure that it is a string
-            scores = sia.polarity_scores(doc["cleaned_content"])
-            sentiment = "positive" if scores["compound"] > 0.05 else "negative" if scores["compound"] < -0.05 else "neutral"
-            sentiments.append(sentiment)
-            sentiment_scores.append(scores["compound"])
-        else:
-            sentiments.append(None)
-            sentiment_scores.append(None)
-
-    df["sentiment"] = sentiments
-    df["sentiment_score"] = sentiment_scores
+    # Scores persisted by the batch job (or an earlier rerun) are reused; only new or edited posts are scored
+    collection, _ = get_mongodb_collection()
+    df, rescored = apply_sentiment(df, collection)
+    if rescored:
+        # They are stored now, so the next load reads them instead of scoring again
+        load_data.clear()
     return df
 
 def cluster_data(df):
@@ -130,14 +87,8 @@ def cluster_data(df):
          st.warning("No data available for clustering after cleaning.")
          return df
 
-    vectorizer = TfidfVectorizer(max_features=1000)
-    X = vectorizer.fit_transform(df["cleaned_content"])
-
-    X = pd.concat([pd.DataFrame(X.toarray()), df["sentiment_score"].reset_index(drop=True)], axis=1)
-    X.columns = X.columns.astype(str)
-
-    kmeans = KMeans(n_clusters=5, random_state=42, n_init='auto')  # Explicitly set n_init
-    df["cluster"] = kmeans.fit_predict(X)
+    # Sparse TF-IDF + sentiment column, mini-batch k-means; the matrix is never densified
+    df["cluster"] = cluster_posts(df["cleaned_content"], df["sentiment_score"])
     return df
 
 def rank_communities(df):
@@ -161,44 +112,20 @@ def rank_communities(df):
     return community_ranking
 
 def analyze_trends(df):
-    if df.empty or 'cleaned_content' not in df.columns or 'timestamp' not in df.columns:
+    if df.empty or 'cleaned_content' not in df.columns or CANONICAL_FIELD not in df.columns:
         st.warning("Insufficient data for trend analysis.")
-        return None, None
-
-    df['timestamp'] = df['timestamp'].apply(parse_timestamp)
-
-    # Count mentions of "Miniso" over time
-    miniso_mentions = {}
-    for i, doc in df.iterrows():
-        content = doc["cleaned_content"]
-        timestamp = doc["timestamp"]
-
-        try:
-            if isinstance(timestamp, str):
-                month = parser.parse(timestamp).strftime('%Y-%m')  # Parse string to datetime
-            elif isinstance(timestamp, float) or isinstance(timestamp, int):
-                month = datetime.fromtimestamp(timestamp).strftime('%Y-%m')  # Unix timestamp
-            elif isinstance(timestamp, datetime):
-                month = timestamp.strftime('%Y-%m')  # Datetime object
-            else:
-                logger.warning(f"Invalid timestamp format in document {doc['_id']}")
-                continue  # Skip to the next document
-        except ValueError as e:
-            logger.warning(f"Error parsing timestamp in document {doc['_id']}: {e}")
-            continue
-        if "miniso" in content.lower():  # Case-insensitive check
-            miniso_mentions.setdefault(month, 0)
-            miniso_mentions[month] += 1
-
-    return miniso_mentions
+        return {}
+
+    # Count mentions of "Miniso" per month; timestamps were normalized once by the loader
+    mentions = df["cleaned_content"].str.contains("miniso", case=False, na=False) & df[CANONICAL_FIELD].notna()
+    return df.loc[mentions, CANONICAL_FIELD].dt.strftime('%Y-%m').value_counts().to_dict()
 
 def predict_trends(df):
-    if df.empty or 'timestamp' not in df.columns:
+    if df.empty or CANONICAL_FIELD not in df.columns:
         st.warning("Insufficient data for trend prediction.")
         return {}
 
-    df['timestamp'] = df['timestamp'].apply(parse_timestamp)
-    df["month"] = pd.to_datetime(df["timestamp"]).dt.to_period("M")
+    df["month"] = df[CANONICAL_FIELD].dt.to_period("M")
 
     time_series = df.groupby(["month", "product_category"]).size().unstack(fill_value=0)
     forecasts = {}
@@ -219,8 +146,6 @@ def main():
     st.set_page_config(layout="wide")  # Use the full width of the page
     st.title("Social Media Analysis Dashboard")
 
-    df = load_data()
-
     with st.sidebar:
         st.header("Analysis Options")
         run_engagement = st.checkbox("Calculate Engagement Scores", value=True)
@@ -230,6 +155,16 @@ def main():
         run_trends = st.checkbox("Analyze Trends", value=True)
         run_prediction = st.checkbox("Predict Trends", value=False)
 
+    # Only the columns behind the enabled sections are fetched from MongoDB
+    sections = tuple(name for name, enabled in (
+        ("engagement", run_engagement),
+        ("sentiment", run_sentiment),
+        ("clustering", run_clustering),
+        ("ranking", run_ranking),
+        ("trends", run_trends),
+        ("prediction", run_prediction),
+    ) if enabled)
+    df = load_data(sections)
 
     plot_key = 1
 
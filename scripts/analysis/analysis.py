@@ -1,15 +1,19 @@
+import os
+import sys
 import pymongo
 import pandas as pd
 import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
 from collections import Counter
-from datetime import datetime
-import pytz
 import logging
 from statsmodels.tsa.arima.model import ARIMA
-from dateutil import parser
+
+# Make the shared analytics package at the repo root importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from analytics.loader import load_sections
+from analytics.scoring import score_engagement
+from analytics.sentiment_cache import apply_sentiment
+from analytics.clustering import StreamingClusterer, N_CLUSTERS
+from analytics.timestamps import CANONICAL_FIELD
 
 nltk.download('vader_lexicon')
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +21,8 @@ logger = logging.getLogger(__name__)
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = "company_data"
 TARGET_COLLECTION = "engagement_data"
+WRITE_BATCH_SIZE = 1000
+CLUSTER_CHUNK_SIZE = 5000
 
 PRODUCT_CATEGORIES = ["earbuds", "skincare", "storage", "plushies", "cosmetics", "stationery", "toys", "home goods",
                       "electronics"]
@@ -36,48 +42,23 @@ def close_mongodb_connection(mongo_client):
         mongo_client.close()
 
 
-def parse_timestamp(timestamp):
-    if isinstance(timestamp, (float, int)):  # Handles both float and int timestamps
-        try:
-            return datetime.fromtimestamp(timestamp, tz=pytz.UTC).replace(tzinfo=None)
-        except OSError:
-            raise ValueError(f"Invalid UNIX timestamp: {timestamp}")
-    elif isinstance(timestamp, str):
-        try:
-            dt = parser.parse(timestamp)
-            return dt.replace(tzinfo=None) if dt.tzinfo else dt
-        except ValueError as e:
-            raise ValueError(f"Unsupported timestamp format: {timestamp}, error: {e}")
-    elif isinstance(timestamp, datetime):
-        return timestamp.replace(tzinfo=None) if timestamp.tzinfo else timestamp
-    else:
-        raise ValueError(f"Unsupported timestamp format: {timestamp}, type: {type(timestamp)}")
-
-
 # Functionalities
 
 def calculate_engagement_score():
     mongo_client, collection = establish_mongodb_connection()
     try:
-        docs = list(collection.find())
-        if not docs:
+        df = load_sections(collection, ["engagement"])
+        if df.empty:
             print("No data found in the engagement_data collection.")
             return
 
-        upvotes = [doc["engagement_metrics"].get("upvotes", 0) for doc in docs]
-        comments = [doc["engagement_metrics"].get("comments", 0) for doc in docs]
-        shares = [doc["engagement_metrics"].get("shares", 0) for doc in docs]
-
-        max_upvotes = max(upvotes) or 1
-        max_comments = max(comments) or 1
-        max_shares = max(shares) or 1
-
-        for doc in docs:
-            u = doc["engagement_metrics"].get("upvotes", 0) / max_upvotes
-            c = doc["engagement_metrics"].get("comments", 0) / max_comments
-            s = doc["engagement_metrics"].get("shares", 0) / max_shares
-            score = (0.4 * u) + (0.4 * c) + (0.2 * s)
-            collection.update_one({"_id": doc["_id"]}, {"$set": {"engagement_score": score}})
+        df = score_engagement(df)
+        updates = [
+            pymongo.UpdateOne({"_id": _id}, {"$set": {"engagement_score": float(score)}})
+            for _id, score in zip(df["_id"], df["engagement_score"])
+        ]
+        for start in range(0, len(updates), WRITE_BATCH_SIZE):
+            collection.bulk_write(updates[start:start + WRITE_BATCH_SIZE], ordered=False)
 
         print("Engagement scores calculated and updated in MongoDB.")
     finally:
@@ -87,46 +68,54 @@ def calculate_engagement_score():
 def perform_sentiment_analysis():
     mongo_client, collection = establish_mongodb_connection()
     try:
-        sia = SentimentIntensityAnalyzer()
-        docs = list(collection.find({"cleaned_content": {"$exists": True}}))
-
-        for doc in docs:
-            scores = sia.polarity_scores(doc["cleaned_content"])
-            sentiment = "positive" if scores["compound"] > 0.05 else "negative" if scores[
-                                                                                       "compound"] < -0.05 else "neutral"
-            collection.update_one(
-                {"_id": doc["_id"]},
-                {"$set": {"sentiment": sentiment, "sentiment_score": scores["compound"]}}
-            )
-
-        print("Sentiment analysis complete and results updated in MongoDB.")
+        df = load_sections(collection, ["sentiment"])
+        _, rescored = apply_sentiment(df, collection)
+        print(f"Sentiment analysis complete: {rescored} new or changed posts scored, {len(df) - rescored} reused.")
     finally:
         close_mongodb_connection(mongo_client)
 
 
+def iter_chunks(collection, query, projection, size=CLUSTER_CHUNK_SIZE):
+    chunk = []
+    for doc in collection.find(query, projection).batch_size(size):
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 def cluster_data():
     mongo_client, collection = establish_mongodb_connection()
     try:
-        docs = list(collection.find({"cleaned_content": {"$exists": True}, "sentiment": {"$exists": True}}))
-        df = pd.DataFrame(docs)
-
-        vectorizer = TfidfVectorizer(max_features=1000)
-        X = vectorizer.fit_transform(df["cleaned_content"])
-
-        X = pd.concat([pd.DataFrame(X.toarray()), df["sentiment_score"].reset_index(drop=True)], axis=1)
-        X.columns = X.columns.astype(str)
-
-        kmeans = KMeans(n_clusters=5, random_state=42)
-        df["cluster"] = kmeans.fit_predict(X)
+        query = {"cleaned_content": {"$type": "string"}, "sentiment": {"$exists": True}}
+        features = {"cleaned_content": 1, "sentiment_score": 1}
+        if collection.count_documents(query) < N_CLUSTERS:
+            print("Not enough analysed posts to cluster.")
+            return
 
-        for i, row in df.iterrows():
-            collection.update_one({"_id": row["_id"]}, {"$set": {"cluster": int(row["cluster"])}})
+        # Two streamed passes (fit, then assign) keep memory bounded by the chunk size
+        clusterer = StreamingClusterer(n_clusters=N_CLUSTERS)
+        for chunk in iter_chunks(collection, query, features):
+            clusterer.partial_fit([doc["cleaned_content"] for doc in chunk], [doc.get("sentiment_score") for doc in chunk])
+
+        products = [Counter() for _ in range(N_CLUSTERS)]
+        sentiments = [Counter() for _ in range(N_CLUSTERS)]
+        for chunk in iter_chunks(collection, query, {**features, "product_category": 1, "sentiment": 1}):
+            labels = clusterer.predict([doc["cleaned_content"] for doc in chunk], [doc.get("sentiment_score") for doc in chunk])
+            collection.bulk_write(
+                [pymongo.UpdateOne({"_id": doc["_id"]}, {"$set": {"cluster": int(label)}}) for doc, label in zip(chunk, labels)],
+                ordered=False,
+            )
+            for doc, label in zip(chunk, labels):
+                products[label][doc.get("product_category")] += 1
+                sentiments[label][doc.get("sentiment")] += 1
 
-        for cluster in range(5):
-            cluster_data = df[df["cluster"] == cluster]
+        for cluster in range(N_CLUSTERS):
             print(f"\nCluster {cluster}:")
-            print("  Top Products:", Counter(cluster_data["product_category"]).most_common(3))
-            print("  Sentiment:", Counter(cluster_data["sentiment"]).most_common())
+            print("  Top Products:", products[cluster].most_common(3))
+            print("  Sentiment:", sentiments[cluster].most_common())
 
         print("Data clustering complete and cluster assignments updated in MongoDB.")
     finally:
@@ -167,31 +156,19 @@ def rank_communities():
 def analyze_trends():
     mongo_client, collection = establish_mongodb_connection()
     try:
-        docs = list(collection.find({"cleaned_content": {"$exists": True}}))
-        product_counts = Counter()
-        monthly_trends = {}
-
-        for doc in docs:
-            content = doc["cleaned_content"]
-            timestamp = doc["timestamp"]
-            try:
-                month = datetime.fromtimestamp(timestamp).strftime("%Y-%m") if isinstance(timestamp,
-                                                                                          float) else datetime.strptime(
-                    timestamp, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%Y-%m") if isinstance(timestamp, str) else ""
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Skipping invalid timestamp in document {doc['_id']}: {e}")
-                continue
-
-            for category in PRODUCT_CATEGORIES:
-                if category in content:
-                    product_counts[category] += 1
-                    monthly_trends.setdefault(month, Counter())[category] += 1
+        df = load_sections(collection, ["trends"])
+        df = df[df[CANONICAL_FIELD].notna()]
+        content = df["cleaned_content"].fillna("")
+        mentions = pd.DataFrame({category: content.str.contains(category, regex=False) for category in PRODUCT_CATEGORIES}, index=df.index)
+        product_counts = Counter({category: int(count) for category, count in mentions.sum().items() if count})
+        monthly_trends = mentions.groupby(df[CANONICAL_FIELD].dt.strftime("%Y-%m")).sum()
 
         logger.info("Top Products:")
         print("Top Products:", product_counts.most_common(5))
-        for month, counts in monthly_trends.items():
-            logger.info(f"{month}: {counts.most_common(3)}")
-            print(f"{month}: {counts.most_common(3)}")
+        for month, counts in monthly_trends.iterrows():
+            top = Counter({category: int(count) for category, count in counts.items() if count}).most_common(3)
+            logger.info(f"{month}: {top}")
+            print(f"{month}: {top}")
     finally:
         close_mongodb_connection(mongo_client)
 
@@ -199,11 +176,8 @@ def analyze_trends():
 def predict_trends():
     mongo_client, collection = establish_mongodb_connection()
     try:
-        docs = list(collection.find({"timestamp": {"$exists": True}}))
-        df = pd.DataFrame(docs)
-
-        df["parsed_timestamp"] = df["timestamp"].apply(parse_timestamp)
-        df["month"] = pd.to_datetime(df["parsed_timestamp"]).dt.to_period("M")
+        df = load_sections(collection, ["prediction"])
+        df["month"] = df[CANONICAL_FIELD].dt.to_period("M")
 
         time_series = df.groupby(["month", "product_category"]).size().unstack(fill_value=0)
 
@@ -235,9 +209,15 @@ def store_top_engagement_posts():
         db = mongo_client[DATABASE_NAME]
         top_collection = db["top_engagement_posts"]
 
+        # Keep answers already precomputed for posts that stay in the top 20
+        ai_answers = {doc["_id"]: doc["ai_answer"]
+                      for doc in top_collection.find({"ai_answer": {"$exists": True}}, {"ai_answer": 1})}
+
         top_collection.delete_many({})
 
         for post in top_posts:
+            if post["_id"] in ai_answers:
+                post["ai_answer"] = ai_answers[post["_id"]]
             top_collection.insert_one(post)
 
         print("Top 20 engagement posts stored successfully in 'top_engagement_posts' collection.")
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import pymongo
+import requests
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Make the shared analytics package at the repo root importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from analytics.answers import post_question, question_hash, is_stale, request_sources
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "company_data")
+TOP_POSTS_COLLECTION = os.getenv("TOP_POSTS_COLLECTION", "top_engagement_posts")
+CHATBOT_API_URL = os.getenv("CHATBOT_API_URL", "http://localhost:7000/chatbot_response")
+CHATBOT_BATCH_API_URL = os.getenv("CHATBOT_BATCH_API_URL", f"{CHATBOT_API_URL}/batch")
+CHATBOT_SOURCES_API_URL = os.getenv("CHATBOT_SOURCES_API_URL", CHATBOT_API_URL.rsplit("/", 1)[0] + "/chatbot_sources/batch")
+PRECOMPUTE_BATCH_SIZE = int(os.getenv("PRECOMPUTE_BATCH_SIZE", 5))
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", 2))
+MAX_RETRIES = 5
+
+def request_batch(questions):
+    # Sent as bulk so interactive chat requests are admitted first in production serving mode
+    for attempt in range(MAX_RETRIES):
+        response = requests.post(CHATBOT_BATCH_API_URL, json={"questions": questions}, headers={"X-Priority": "bulk"})
+        if response.status_code == 429:
+            time.sleep(int(response.headers.get("Retry-After", 5)))
+            continue
+        response.raise_for_status()
+        return response.json()
+    raise RuntimeError(f"Chatbot stayed busy after {MAX_RETRIES} attempts")
+
+
+def answer_batch(collection, docs, sources):
+    questions = [post_question(doc) for doc in docs]
+    payload = request_batch(questions)
+    meta = payload.get("meta", {})
+    stored = 0
+    for doc, question, doc_sources, result in zip(docs, questions, sources, payload.get("results", [])):
+        if "answer" not in result:
+            logger.warning(f"No answer for post {doc['_id']}: {result.get('error')}")
+            continue
+        collection.update_one({"_id": doc["_id"]}, {"$set": {"ai_answer": {
+            "text": result["answer"],
+            "question_hash": question_hash(question),
+            "model": meta.get("model"),
+            "prompt_version": meta.get("prompt_version"),
+            "index_version": meta.get("index_version"),
+            "sources": doc_sources,
+            "generated_at": datetime.now(timezone.utc),
+        }}})
+        stored += 1
+    return stored
+
+
+def precompute_answers(force=False):
+    mongo_client = pymongo.MongoClient(MONGODB_URI)
+    try:
+        collection = mongo_client[DATABASE_NAME][TOP_POSTS_COLLECTION]
+        docs = [doc for doc in collection.find(
+            {"engagement_score": {"$exists": True}},
+            {"cleaned_content": 1, "title": 1, "content": 1, "ai_answer": 1},
+        ) if post_question(doc)]
+        if not docs:
+            print("No top posts to answer")
+            return
+        # Retrieval only, no generation: what each answer would be grounded on now
+        sources, info = request_sources(CHATBOT_SOURCES_API_URL, [post_question(doc) for doc in docs])
+        stale = [(doc, doc_sources) for doc, doc_sources in zip(docs, sources) if force or is_stale(doc, info, doc_sources)]
+        print(f"{len(stale)} of {len(docs)} top posts need new answers")
+        if not stale:
+            return
+
+        batches = [stale[i:i + PRECOMPUTE_BATCH_SIZE] for i in range(0, len(stale), PRECOMPUTE_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=PRECOMPUTE_CONCURRENCY) as pool:
+            stored = sum(pool.map(lambda batch: answer_batch(collection, *zip(*batch)), batches))
+        print(f"Stored {stored} precomputed answers in '{TOP_POSTS_COLLECTION}'")
+    finally:
+        mongo_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and store chatbot answers for the top engagement posts.")
+    parser.add_argument("--force", action="store_true", help="Regenerate every answer, not just stale ones")
+    args = parser.parse_args()
+    precompute_answers(force=args.force)
+
+
+if __name__ == "__main__":
+    main()
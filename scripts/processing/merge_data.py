@@ -1,6 +1,11 @@
+import os
+import sys
 import pymongo
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from analytics.timestamps import CANONICAL_FIELD, to_utc_datetime
+
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = "company_data"
@@ -59,6 +64,9 @@ def combine_collections():
     unique_data = {}
     for item in all_data:
         unique_data[item["record_id"]] = item  # record_id is guaranteed here
+        if item.get(CANONICAL_FIELD) is None:
+            # Scrapers that predate the canonical field (and Quora's free-form dates) are normalized here
+            item[CANONICAL_FIELD] = to_utc_datetime(item.get("timestamp"))
     deduplicated_data = list(unique_data.values())
     print(f"Deduplicated to {len(deduplicated_data)} unique records")
 
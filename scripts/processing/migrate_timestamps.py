@@ -0,0 +1,58 @@
+import os
+import sys
+import argparse
+import pymongo
+import pandas as pd
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from analytics.timestamps import CANONICAL_FIELD, normalize_timestamps
+
+load_dotenv()
+MONGODB_URI = os.getenv("MONGODB_URI")
+DATABASE_NAME = "company_data"
+COLLECTIONS = ["engagement_data", "reddit_data", "discord_data", "quora_data"]
+CHUNK_SIZE = 5000
+
+
+def migrate_collection(collection, chunk_size=CHUNK_SIZE):
+    """Backfill ``timestamp_utc`` on documents stored before it existed; returns (updated, unparseable)."""
+    query = {CANONICAL_FIELD: {"$exists": False}, "timestamp": {"$exists": True}}
+    updated, unparseable, last_id = 0, 0, None
+    while True:
+        # Page by _id so documents updated in earlier chunks are never rescanned
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        docs = list(collection.find(page, {"timestamp": 1}).sort("_id", 1).limit(chunk_size))
+        if not docs:
+            return updated, unparseable
+        last_id = docs[-1]["_id"]
+        parsed = normalize_timestamps([doc["timestamp"] for doc in docs])
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {CANONICAL_FIELD: value.to_pydatetime()}})
+            for doc, value in zip(docs, parsed) if pd.notna(value)
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+        unparseable += len(docs) - len(operations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store a canonical UTC timestamp on documents scraped before it was recorded.")
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    mongo_client = pymongo.MongoClient(MONGODB_URI)
+    try:
+        db = mongo_client[DATABASE_NAME]
+        for name in args.collections:
+            updated, unparseable = migrate_collection(db[name], args.chunk_size)
+            print(f"{name}: set {CANONICAL_FIELD} on {updated} documents, {unparseable} timestamps could not be parsed")
+    finally:
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,7 @@ async def scrape_channel(channel):
             "author": str(message.author),
             "author_id": str(message.author.id),
             "timestamp": message.created_at.isoformat(),
+            "timestamp_utc": message.created_at,
             "engagement_metrics": {
                 "upvotes": 0,
                 "comments": 0,
@@ -1,5 +1,6 @@
 import os
 import praw
+from datetime import datetime, timezone
 import pymongo
 from dotenv import load_dotenv
 
@@ -38,6 +39,7 @@ def fetch_reddit_data(queries, limit_per_query=100):
                     "title": post.title,
                     "author": str(post.author) if post.author else "unknown",
                     "timestamp": post.created_utc,
+                    "timestamp_utc": datetime.fromtimestamp(post.created_utc, tz=timezone.utc),
                     "url": post.url,
                     "engagement_metrics": {
                         "upvotes": post.score,
@@ -1,22 +1,24 @@
 import os
 import json
+import uuid
 import streamlit as st
 import requests
 import pandas as pd
 import pymongo
 import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from datetime import datetime
-import pytz
 import logging
 from statsmodels.tsa.arima.model import ARIMA
-from dateutil import parser
 import plotly.express as px
 import streamlit.components.v1 as components
 import time
 from dotenv import load_dotenv
+from ai_bot.history_store import HistoryStore, HISTORY_PAGE_SIZE
+from analytics.loader import load_sections
+from analytics.scoring import score_engagement
+from analytics.sentiment_cache import apply_sentiment
+from analytics.clustering import cluster_posts
+from analytics.timestamps import CANONICAL_FIELD
+from analytics.answers import post_question, is_stale, request_sources
 
 # Load environment variables
 load_dotenv()
@@ -29,12 +31,17 @@ st.set_page_config(page_title="AI-Grow Dashboard", layout="wide")
 # Load configuration from environment variables
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
 CHATBOT_API_URL = os.getenv("CHATBOT_API_URL", "http://localhost:7000/chatbot_response")
+CHATBOT_STREAM_API_URL = os.getenv("CHATBOT_STREAM_API_URL", f"{CHATBOT_API_URL}/stream")
+CHATBOT_BATCH_API_URL = os.getenv("CHATBOT_BATCH_API_URL", f"{CHATBOT_API_URL}/batch")
+CHATBOT_SOURCES_API_URL = os.getenv("CHATBOT_SOURCES_API_URL", CHATBOT_API_URL.rsplit("/", 1)[0] + "/chatbot_sources/batch")
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "company_data")
 TOP_POSTS_COLLECTION = os.getenv("TOP_POSTS_COLLECTION", "top_engagement_posts")
 TARGET_COLLECTION = os.getenv("TARGET_COLLECTION", "engagement_data")
 SLACK_WORKSPACE_URL = os.getenv("SLACK_WORKSPACE_URL")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
+# How long a staleness check of the stored answers is reused across reruns (every radio click reruns the page)
+STALENESS_CHECK_TTL = int(os.getenv("STALENESS_CHECK_TTL", 600))
 
 PRODUCT_CATEGORIES = ["earbuds", "skincare", "storage", "plushies", "cosmetics", "stationery", "toys", "home goods", "electronics"]
 SUGGESTED_COMMUNITIES = {
@@ -56,50 +63,84 @@ logger = logging.getLogger(__name__)
 # ---------------------------
 # Chatbot Interactive Functions (Using Chatbot API)
 # ---------------------------
-def load_chat_history():
-    return json.load(open("chat_history.json", "r")) if os.path.exists("chat_history.json") else []
+history_store = HistoryStore()
 
-def save_chat_history(history):
-    with open("chat_history.json", "w") as f:
-        json.dump(history, f)
+def get_session_id():
+    # Kept in the URL so a browser reload resumes the same conversation
+    if "session" not in st.query_params:
+        st.query_params["session"] = uuid.uuid4().hex
+    return st.query_params["session"]
 
-def clear_chat_history():
-    if os.path.exists("chat_history.json"):
-        os.remove("chat_history.json")
+def load_chat_history(before_id=None):
+    return history_store.recent(get_session_id(), limit=HISTORY_PAGE_SIZE, before_id=before_id)
 
-def process_user_input_api():
-    user_query = st.session_state.user_input.strip()
-    if not user_query:
-        return
-    data = {"question": user_query}
+def save_chat_messages(messages):
+    history_store.append_many(get_session_id(), messages)
+
+def clear_chat_history():
+    history_store.clear(get_session_id())
+
+def load_earlier_messages():
+    oldest_id = st.session_state.history[0].get("id") if st.session_state.history else None
+    st.session_state.history[:0] = load_chat_history(before_id=oldest_id)
+
+def stream_chatbot_answer(question):
+    """Yield answer tokens from the streaming chatbot endpoint as they arrive."""
+    with requests.post(CHATBOT_STREAM_API_URL, json={"question": question}, stream=True) as response:
+        if response.status_code != 200:
+            yield "Error: Unable to retrieve chatbot response."
+            return
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if "error" in event:
+                yield f"Error: {event['error']}"
+                return
+            if event.get("done"):
+                return
+            yield event.get("token", "")
+
+def render_chat_bubble(origin, message, target=st):
+    chat_bubble = f"""
+    <div class='chat-row {'row-reverse' if origin == 'human' else ''}' style="margin: 10px 0;">
+        <div style="padding: 10px; border-radius: 10px; max-width: 80%; word-wrap: break-word; {'background-color: #0078FF; color: white;' if origin=='human' else 'background-color: #f0f0f0; color: black;'}">
+            {message}
+        </div>
+    </div>
+    """
+    target.markdown(chat_bubble, unsafe_allow_html=True)
+
+def process_user_input_api(user_query, chat_area):
+    with chat_area:
+        render_chat_bubble("human", user_query)
+        answer_placeholder = st.empty()
+    # Render tokens progressively so time-to-first-token is what the user waits for
+    answer = ""
     try:
-        response = requests.post(CHATBOT_API_URL, json=data)
-        if response.status_code == 200:
-            answer = response.json().get("answer")
-        else:
-            answer = "Error: Unable to retrieve chatbot response."
+        for token in stream_chatbot_answer(user_query):
+            answer += token
+            render_chat_bubble("ai", answer, answer_placeholder)
     except Exception as e:
         answer = f"Error: {e}"
-    st.session_state.history.append({"origin": "human", "message": user_query})
-    st.session_state.history.append({"origin": "ai", "message": answer})
-    save_chat_history(st.session_state.history)
+        render_chat_bubble("ai", answer, answer_placeholder)
+    new_messages = [{"origin": "human", "message": user_query}, {"origin": "ai", "message": answer}]
+    st.session_state.history.extend(new_messages)
+    save_chat_messages(new_messages)
 
 def render_chat_interface():
     st.title("🚀 AI Engagement Assistant")
+    if len(st.session_state.history) < history_store.count(get_session_id()):
+        st.button("Load earlier messages", on_click=load_earlier_messages)
     chat_area = st.container()
     with chat_area:
         for chat in st.session_state.history:
-            chat_bubble = f"""
-            <div class='chat-row {'row-reverse' if chat['origin'] == 'human' else ''}' style="margin: 10px 0;">
-                <div style="padding: 10px; border-radius: 10px; max-width: 80%; word-wrap: break-word; {'background-color: #0078FF; color: white;' if chat['origin']=='human' else 'background-color: #f0f0f0; color: black;'}">
-                    {chat['message']}
-                </div>
-            </div>
-            """
-            st.markdown(chat_bubble, unsafe_allow_html=True)
-    with st.form("chat-form"):
-        st.text_input("Ask about engagement trends, posts, and insights! ✨", key="user_input")
-        st.form_submit_button("Submit", on_click=process_user_input_api)
+            render_chat_bubble(chat['origin'], chat['message'])
+    with st.form("chat-form", clear_on_submit=True):
+        user_query = st.text_input("Ask about engagement trends, posts, and insights! ✨", key="user_input")
+        submitted = st.form_submit_button("Submit")
+    if submitted and user_query.strip():
+        process_user_input_api(user_query.strip(), chat_area)
     components.html("""
     <script>
     const streamlitDoc = window.parent.document;
@@ -127,24 +168,49 @@ def get_questions():
     db = client[DATABASE_NAME]
     collection = db[TOP_POSTS_COLLECTION]
     query = {"engagement_score": {"$exists": True}}
-    cursor = collection.find(query).sort("engagement_score", -1)
-    questions = []
-    for doc in cursor:
-        question = doc.get("cleaned_content") or doc.get("title") or doc.get("content")
-        questions.append(question)
+    projection = {"cleaned_content": 1, "title": 1, "content": 1, "ai_answer": 1}
+    docs = list(collection.find(query, projection).sort("engagement_score", -1))
     client.close()
+    status = answer_status([doc for doc in docs if doc.get("ai_answer") and post_question(doc)])
+    questions = []
+    for doc in docs:
+        # Answer written ahead of time by scripts/analysis/precompute_answers.py, if any
+        answer = (doc.get("ai_answer") or {}).get("text")
+        questions.append((post_question(doc), answer, status.get(str(doc["_id"]))))
     return questions
 
-def get_chatbot_response_api(question):
-    data = {"question": question}
+def answer_status(docs):
+    """Staleness of each stored answer by post id: "fresh", "stale", or "unchecked" when the chatbot cannot be reached."""
+    if not docs:
+        return {}
+    # Post id, question and stored answer make up the cache key, so a new precompute run invalidates it
+    keys = tuple((str(doc["_id"]), post_question(doc), json.dumps(doc["ai_answer"], sort_keys=True, default=str)) for doc in docs)
     try:
-        response = requests.post(CHATBOT_API_URL, json=data)
+        return check_stored_answers(keys)
+    except Exception as e:
+        logger.warning(f"Could not check precomputed answers: {e}")
+        return {post_id: "unchecked" for post_id, _, _ in keys}
+
+@st.cache_data(ttl=STALENESS_CHECK_TTL, show_spinner="Checking stored answers against the chatbot...")
+def check_stored_answers(keys):
+    # Errors propagate instead of being returned, so st.cache_data never stores a failed check
+    sources, info = request_sources(CHATBOT_SOURCES_API_URL, [question for _, question, _ in keys])
+    return {
+        post_id: "stale" if is_stale({"cleaned_content": question, "ai_answer": json.loads(answer)}, info, doc_sources) else "fresh"
+        for (post_id, question, answer), doc_sources in zip(keys, sources)
+    }
+
+def get_chatbot_responses_api(questions):
+    # One batch request instead of one blocking call per question
+    data = {"questions": questions}
+    try:
+        response = requests.post(CHATBOT_BATCH_API_URL, json=data)
         if response.status_code == 200:
-            return response.json().get("answer")
+            return [item.get("answer") or f"Error: {item.get('error')}" for item in response.json().get("results", [])]
         else:
-            return "Error: Unable to retrieve chatbot response."
+            return ["Error: Unable to retrieve chatbot response."] * len(questions)
     except Exception as e:
-        return f"Error: {e}"
+        return [f"Error: {e}"] * len(questions)
 
 def send_to_slack(message):
     payload = {"text": message}
@@ -157,15 +223,27 @@ def send_to_slack(message):
 def slack_approval_page():
     st.header("Slack Approval")
     st.markdown("This section displays top questions with their AI-generated responses. Please choose 'Yes' to approve each Q&A for posting to Slack.")
-    questions = get_questions()
-    if not questions:
+    rows = get_questions()
+    if not rows:
         st.warning("No questions found.")
         return
-    for idx, question in enumerate(questions, start=1):
-        answer = get_chatbot_response_api(question)
+    questions = [question for question, _, _ in rows]
+    answers = [answer for _, answer, _ in rows]
+    statuses = [status for _, _, status in rows]
+    # Only posts the precompute job has not answered yet go to the chatbot live
+    missing = [i for i, answer in enumerate(answers) if not answer]
+    if missing:
+        for i, answer in zip(missing, get_chatbot_responses_api([questions[i] for i in missing])):
+            answers[i] = answer
+    for idx, (question, answer, status) in enumerate(zip(questions, answers, statuses), start=1):
         st.markdown(f"**Q{idx}:** {question}")
         st.markdown(f"**A{idx}:** {answer}")
-        approval_choice = st.radio(f"Approve Q{idx}?", options=["Yes", "No"], key=f"approval_choice_{idx}")
+        if status == "stale":
+            st.warning("This stored answer is out of date (model, prompt or source documents changed). Rerun scripts/analysis/precompute_answers.py before approving it.")
+        elif status == "unchecked":
+            st.info("The chatbot could not be reached (it may still be starting), so this stored answer has not been checked for staleness yet.")
+        # Stale answers are never sent by default
+        approval_choice = st.radio(f"Approve Q{idx}?", options=["Yes", "No"], index=1 if status == "stale" else 0, key=f"approval_choice_{idx}")
         if approval_choice == "Yes":
             qa_message = (
                 f"*Q{idx}:* {question}\n"
@@ -196,79 +274,32 @@ def close_mongodb_connection(mongo_client):
         mongo_client.close()
 
 @st.cache_data(ttl=3600)
-def load_data():
-    collection, mongo_client = get_mongodb_collection()
+def load_data(sections):
+    # The client is cached by st.cache_resource, so it stays open across reruns
+    collection, _ = get_mongodb_collection()
     try:
-        docs = list(collection.find())
-        df = pd.DataFrame(docs)
-        return df
+        return load_sections(collection, sections)
     except Exception as e:
         st.error(f"Error loading data from MongoDB: {e}")
         return pd.DataFrame()
-    finally:
-        close_mongodb_connection(mongo_client)
-
-def parse_timestamp(timestamp):
-    if isinstance(timestamp, (float, int)):
-        try:
-            return datetime.fromtimestamp(timestamp, tz=pytz.UTC).replace(tzinfo=None)
-        except OSError:
-            raise ValueError(f"Invalid UNIX timestamp: {timestamp}")
-    elif isinstance(timestamp, str):
-        try:
-            dt = parser.parse(timestamp)
-            return dt.replace(tzinfo=None) if dt.tzinfo else dt
-        except ValueError as e:
-            raise ValueError(f"Unsupported timestamp format: {timestamp}, error: {e}")
-    elif isinstance(timestamp, datetime):
-        return timestamp.replace(tzinfo=None) if timestamp.tzinfo else timestamp
-    else:
-        raise ValueError(f"Unsupported timestamp format: {timestamp}, type: {type(timestamp)}")
 
 def calculate_engagement_score(df):
     if df.empty:
         st.warning("No data available to calculate engagement scores.")
         return df
-
-    upvotes = [doc["engagement_metrics"].get("upvotes", 0) for i, doc in df.iterrows()]
-    comments = [doc["engagement_metrics"].get("comments", 0) for i, doc in df.iterrows()]
-    shares = [doc["engagement_metrics"].get("shares", 0) for i, doc in df.iterrows()]
-
-    max_upvotes = max(upvotes) or 1
-    max_comments = max(comments) or 1
-    max_shares = max(shares) or 1
-
-    engagement_scores = []
-    for i, doc in df.iterrows():
-        u = doc["engagement_metrics"].get("upvotes", 0) / max_upvotes
-        c = doc["engagement_metrics"].get("comments", 0) / max_comments
-        s = doc["engagement_metrics"].get("shares", 0) / max_shares
-        score = (0.4 * u) + (0.4 * c) + (0.2 * s)
-        engagement_scores.append(score)
-
-    df["engagement_score"] = engagement_scores
-    return df
+    return score_engagement(df)
 
 def perform_sentiment_analysis(df):
     if df.empty:
         st.warning("No data available for sentiment analysis.")
         return df
 
-    sia = SentimentIntensityAnalyzer()
-    sentiments = []
-    sentiment_scores = []
-    for i, doc in df.iterrows():
-        if 'cleaned_content' in doc and isinstance(doc['cleaned_content'], str):
-            scores = sia.polarity_scores(doc["cleaned_content"])
-            sentiment = "positive" if scores["compound"] > 0.05 else "negative" if scores["compound"] < -0.05 else "neutral"
-            sentiments.append(sentiment)
-            sentiment_scores.append(scores["compound"])
-        else:
-            sentiments.append(None)
-            sentiment_scores.append(None)
-
-    df["sentiment"] = sentiments
-    df["sentiment_score"] = sentiment_scores
+    # Scores persisted by the batch job (or an earlier rerun) are reused; only new or edited posts are scored
+    collection, _ = get_mongodb_collection()
+    df, rescored = apply_sentiment(df, collection)
+    if rescored:
+        # They are stored now, so the next load reads them instead of scoring again
+        load_data.clear()
     return df
 
 def cluster_data(df):
@@ -281,14 +312,8 @@ def cluster_data(df):
          st.warning("No data available for clustering after cleaning.")
          return df
 
-    vectorizer = TfidfVectorizer(max_features=1000)
-    X = vectorizer.fit_transform(df["cleaned_content"])
-
-    X = pd.concat([pd.DataFrame(X.toarray()), df["sentiment_score"].reset_index(drop=True)], axis=1)
-    X.columns = X.columns.astype(str)
-
-    kmeans = KMeans(n_clusters=5, random_state=42, n_init='auto')
-    df["cluster"] = kmeans.fit_predict(X)
+    # Sparse TF-IDF + sentiment column, mini-batch k-means; the matrix is never densified
+    df["cluster"] = cluster_posts(df["cleaned_content"], df["sentiment_score"])
     return df
 
 def rank_communities(df):
@@ -306,40 +331,20 @@ def rank_communities(df):
     return community_ranking
 
 def analyze_trends(df):
-    if df.empty or 'cleaned_content' not in df.columns or 'timestamp' not in df.columns:
+    if df.empty or 'cleaned_content' not in df.columns or CANONICAL_FIELD not in df.columns:
         st.warning("Insufficient data for trend analysis.")
-        return None
+        return {}
 
-    df['timestamp'] = df['timestamp'].apply(parse_timestamp)
-    miniso_mentions = {}
-    for i, doc in df.iterrows():
-        content = doc["cleaned_content"]
-        timestamp = doc["timestamp"]
-        try:
-            if isinstance(timestamp, str):
-                month = parser.parse(timestamp).strftime('%Y-%m')
-            elif isinstance(timestamp, (float, int)):
-                month = datetime.fromtimestamp(timestamp).strftime('%Y-%m')
-            elif isinstance(timestamp, datetime):
-                month = timestamp.strftime('%Y-%m')
-            else:
-                logger.warning(f"Invalid timestamp format in document {doc.get('_id', '')}")
-                continue
-        except ValueError as e:
-            logger.warning(f"Error parsing timestamp in document {doc.get('_id', '')}: {e}")
-            continue
-        if "miniso" in content.lower():
-            miniso_mentions.setdefault(month, 0)
-            miniso_mentions[month] += 1
-    return miniso_mentions
+    # Count mentions of "Miniso" per month; timestamps were normalized once by the loader
+    mentions = df["cleaned_content"].str.contains("miniso", case=False, na=False) & df[CANONICAL_FIELD].notna()
+    return df.loc[mentions, CANONICAL_FIELD].dt.strftime('%Y-%m').value_counts().to_dict()
 
 def predict_trends(df):
-    if df.empty or 'timestamp' not in df.columns:
+    if df.empty or CANONICAL_FIELD not in df.columns:
         st.warning("Insufficient data for trend prediction.")
         return {}
 
-    df['timestamp'] = df['timestamp'].apply(parse_timestamp)
-    df["month"] = pd.to_datetime(df["timestamp"]).dt.to_period("M")
+    df["month"] = df[CANONICAL_FIELD].dt.to_period("M")
     time_series = df.groupby(["month", "product_category"]).size().unstack(fill_value=0)
     forecasts = {}
     for category in PRODUCT_CATEGORIES:
@@ -356,7 +361,6 @@ def predict_trends(df):
 
 def dashboard_page():
     st.subheader("Social Media Analysis Dashboard")
-    df = load_data()
     
     with st.sidebar:
         st.header("Analysis Options")
@@ -366,6 +370,17 @@ def dashboard_page():
         run_ranking = st.checkbox("Rank Communities", value=True)
         run_trends = st.checkbox("Analyze Trends", value=True)
         run_prediction = st.checkbox("Predict Trends", value=False)
+
+    # Only the columns behind the enabled sections are fetched from MongoDB
+    sections = tuple(name for name, enabled in (
+        ("engagement", run_engagement),
+        ("sentiment", run_sentiment),
+        ("clustering", run_clustering),
+        ("ranking", run_ranking),
+        ("trends", run_trends),
+        ("prediction", run_prediction),
+    ) if enabled)
+    df = load_data(sections)
     
     plot_key = 1
 